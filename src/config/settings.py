@@ -29,15 +29,19 @@ class Config:
     REDIS_MAX_CONNECTIONS: int = 10
     
     # Worker settings
-    WORKER_CONCURRENCY: int = 4
+    WORKER_CONCURRENCY: int = 4  # Handler threads per worker process
+    WORKER_PREFETCH: int = 1  # Messages claimed ahead of each handler thread
     MAX_RETRIES: int = 3
     RETRY_BASE_DELAY: float = 1.0  # Base delay in seconds for exponential backoff
     RETRY_MAX_DELAY: float = 300.0  # Maximum delay in seconds
     TASK_TIMEOUT: int = 3600  # Default task timeout in seconds (1 hour)
+    DELAY_INLINE_MAX_SECONDS: float = 1.0  # Longer delay steps are rescheduled via the queue
     
     # Queue settings
     QUEUE_NAME: str = "workflow_tasks"
     QUEUE_PROCESSING_TIMEOUT: int = 30  # Visibility timeout in seconds
+    QUEUE_BATCH_SIZE: int = 10  # Max messages claimed per dequeue; all share one visibility window
+    QUEUE_BATCH_MAX_DELAY_MS: int = 300  # Max time a completed message waits for its batch ack
     
     # Logging settings
     LOG_LEVEL: str = "INFO"
@@ -56,12 +60,16 @@ class Config:
             REDIS_URL=os.getenv("REDIS_URL", cls.REDIS_URL),
             REDIS_MAX_CONNECTIONS=int(os.getenv("REDIS_MAX_CONNECTIONS", cls.REDIS_MAX_CONNECTIONS)),
             WORKER_CONCURRENCY=int(os.getenv("WORKER_CONCURRENCY", cls.WORKER_CONCURRENCY)),
+            WORKER_PREFETCH=int(os.getenv("WORKER_PREFETCH", cls.WORKER_PREFETCH)),
             MAX_RETRIES=int(os.getenv("MAX_RETRIES", cls.MAX_RETRIES)),
             RETRY_BASE_DELAY=float(os.getenv("RETRY_BASE_DELAY", cls.RETRY_BASE_DELAY)),
             RETRY_MAX_DELAY=float(os.getenv("RETRY_MAX_DELAY", cls.RETRY_MAX_DELAY)),
             TASK_TIMEOUT=int(os.getenv("TASK_TIMEOUT", cls.TASK_TIMEOUT)),
+            DELAY_INLINE_MAX_SECONDS=float(os.getenv("DELAY_INLINE_MAX_SECONDS", cls.DELAY_INLINE_MAX_SECONDS)),
             QUEUE_NAME=os.getenv("QUEUE_NAME", cls.QUEUE_NAME),
             QUEUE_PROCESSING_TIMEOUT=int(os.getenv("QUEUE_PROCESSING_TIMEOUT", cls.QUEUE_PROCESSING_TIMEOUT)),
+            QUEUE_BATCH_SIZE=int(os.getenv("QUEUE_BATCH_SIZE", cls.QUEUE_BATCH_SIZE)),
+            QUEUE_BATCH_MAX_DELAY_MS=int(os.getenv("QUEUE_BATCH_MAX_DELAY_MS", cls.QUEUE_BATCH_MAX_DELAY_MS)),
             LOG_LEVEL=os.getenv("LOG_LEVEL", cls.LOG_LEVEL),
             LOG_FORMAT=os.getenv("LOG_FORMAT", cls.LOG_FORMAT),
         )
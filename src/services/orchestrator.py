@@ -6,17 +6,19 @@ handles failures and retries.
 """
 
 import logging
+import threading
 import time
 import traceback
+from collections import OrderedDict
 from typing import Any, Dict, Optional
 from uuid import UUID
 
-from src.domain import ExecutionStatus, StepStatus, LogLevel
-from src.domain.entities import StepExecution, WorkflowStep
+from src.domain import ExecutionStatus, StepStatus, LogLevel, WorkflowStatus
+from src.domain.entities import StepExecution, Workflow, WorkflowStep
 from src.persistence import WorkflowRepository, ExecutionRepository, LogRepository
 from src.config import get_config
 from .execution_service import ExecutionService
-from .task_handlers import TaskHandlerRegistry, TaskHandler
+from .task_handlers import TaskHandlerRegistry, TaskHandler, StepDeferred, PreparedStep
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +48,12 @@ class WorkflowOrchestrator:
     - Support resumable executions
     """
     
+    # Max workflow definitions kept in memory
+    WORKFLOW_CACHE_SIZE = 256
+    
+    # Max prepared step handlers kept in memory
+    PREPARED_STEP_CACHE_SIZE = 1024
+    
     def __init__(
         self,
         workflow_repo: WorkflowRepository,
@@ -61,16 +69,35 @@ class WorkflowOrchestrator:
         )
         self.task_registry = task_registry or TaskHandlerRegistry()
         self.config = get_config()
+        
+        # Steps are immutable once their workflow leaves DRAFT, so handlers
+        # bound to a step's config can be reused across executions
+        self._prepared_steps: "OrderedDict[UUID, PreparedStep]" = OrderedDict()
+        
+        # Same for the workflow definitions themselves (each version has its
+        # own id), so executions of a hot workflow don't re-read it each time.
+        # Both caches share one lock, since evicting a workflow also drops
+        # its prepared steps.
+        self._workflows: "OrderedDict[UUID, Workflow]" = OrderedDict()
+        self._workflows_lock = threading.Lock()
     
-    def execute(self, execution_id: UUID) -> Dict[str, Any]:
+    def execute(
+        self,
+        execution_id: UUID,
+        resume_state: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         """
         Execute a workflow from its current state.
         
         This is the main entry point for workflow execution.
         Supports resuming from the last successful step.
+        
+        If a step defers (e.g. a long delay), progress is saved and a
+        "deferred" result is returned with the `resume_state` to pass back
+        in once `delay_seconds` have elapsed.
         """
         execution = self.execution_service.get_execution(execution_id)
-        workflow = self.workflow_repo.get_workflow_by_id(execution.workflow_id)
+        workflow = self._get_workflow(execution.workflow_id)
         
         if not workflow:
             raise OrchestratorError(f"Workflow {execution.workflow_id} not found")
@@ -97,8 +124,12 @@ class WorkflowOrchestrator:
             steps.sort(key=lambda s: s.step_order)
             
             # Execute each step
-            step_outputs: Dict[str, Any] = {}
-            current_data = execution.input_data.copy()
+            if resume_state:
+                step_outputs = dict(resume_state["steps"])
+                current_data = dict(resume_state["data"])
+            else:
+                step_outputs = {}
+                current_data = execution.input_data.copy()
             
             for step in steps:
                 logger.info(f"Executing step {step.step_order}: {step.name}")
@@ -109,24 +140,39 @@ class WorkflowOrchestrator:
                         step=step,
                         input_data=current_data,
                     )
-                    
-                    step_outputs[step.name] = output
-                    
-                    # Merge step output into current data for next step
-                    if output:
-                        current_data.update(output)
-                    
-                    # Update execution progress
-                    self.execution_repo.update_execution_status(
-                        execution_id,
-                        ExecutionStatus.RUNNING,
-                        current_step_order=step.step_order + 1,
-                    )
-                    
+                    deferred = None
+                except StepDeferred as e:
+                    output = e.output
+                    deferred = e
                 except StepExecutionError as e:
                     logger.error(f"Step {step.name} failed: {e}")
                     self._handle_step_failure(execution_id, step, e)
                     raise
+                
+                step_outputs[step.name] = output
+                
+                # Merge step output into current data for next step
+                if output:
+                    current_data.update(output)
+                
+                # Update execution progress
+                self.execution_repo.update_execution_status(
+                    execution_id,
+                    ExecutionStatus.RUNNING,
+                    current_step_order=step.step_order + 1,
+                )
+                
+                if deferred is not None:
+                    logger.info(
+                        f"Execution {execution_id} deferred for {deferred.seconds}s "
+                        f"after step {step.name}"
+                    )
+                    return {
+                        "status": "deferred",
+                        "execution_id": str(execution_id),
+                        "delay_seconds": deferred.seconds,
+                        "resume_state": {"steps": step_outputs, "data": current_data},
+                    }
             
             # All steps completed successfully
             final_output = {
@@ -161,6 +207,7 @@ class WorkflowOrchestrator:
         Execute a single workflow step with retry logic.
         
         Returns the step output on success, raises StepExecutionError on failure.
+        StepDeferred from the handler is propagated after the step is recorded.
         """
         # Create step execution record
         step_exec = self.execution_service.create_step_execution(
@@ -199,11 +246,8 @@ class WorkflowOrchestrator:
                 )
                 
                 # Execute the handler
-                output = handler.execute(
-                    step_config=step.config,
-                    input_data=input_data,
-                    timeout=step.timeout_seconds,
-                )
+                run_step = self._get_prepared_step(step, handler)
+                output = run_step(input_data, step.timeout_seconds)
                 
                 # Success!
                 self.execution_service.update_step_execution(
@@ -221,6 +265,23 @@ class WorkflowOrchestrator:
                 
                 return output
                 
+            except StepDeferred as deferred:
+                # Not a failure - the step's work resumes after the delay
+                self.execution_service.update_step_execution(
+                    step_exec.id,
+                    StepStatus.COMPLETED,
+                    output_data=deferred.output,
+                )
+                
+                self._log(
+                    execution_id,
+                    LogLevel.INFO,
+                    f"Step '{step.name}' deferred for {deferred.seconds}s",
+                    step_execution_id=step_exec.id,
+                )
+                
+                raise
+                
             except Exception as e:
                 last_error = e
                 error_details = {
@@ -255,6 +316,53 @@ class WorkflowOrchestrator:
         
         raise StepExecutionError(step.name, error_msg, {"last_error": str(last_error)})
     
+    def _get_workflow(self, workflow_id: UUID) -> Optional[Workflow]:
+        """
+        Get a workflow definition, from the LRU cache when possible.
+        
+        Drafts aren't cached since their steps can still change; a workflow
+        only enters the cache after leaving DRAFT, so activation never
+        needs to invalidate anything.
+        """
+        with self._workflows_lock:
+            workflow = self._workflows.get(workflow_id)
+            if workflow is not None:
+                self._workflows.move_to_end(workflow_id)
+                return workflow
+        
+        workflow = self.workflow_repo.get_workflow_by_id(workflow_id)
+        if workflow is None or workflow.status == WorkflowStatus.DRAFT:
+            return workflow
+        
+        with self._workflows_lock:
+            self._workflows[workflow_id] = workflow
+            if len(self._workflows) > self.WORKFLOW_CACHE_SIZE:
+                _, evicted = self._workflows.popitem(last=False)
+                for step in evicted.steps:
+                    self._prepared_steps.pop(step.id, None)
+        return workflow
+    
+    def _get_prepared_step(self, step: WorkflowStep, handler: TaskHandler) -> PreparedStep:
+        """
+        Get the handler bound to this step's config, preparing it on first use.
+        
+        Kept in an LRU cache; entries also go when their workflow is evicted
+        from the workflow cache.
+        """
+        with self._workflows_lock:
+            run_step = self._prepared_steps.get(step.id)
+            if run_step is not None:
+                self._prepared_steps.move_to_end(step.id)
+                return run_step
+        
+        run_step = handler.prepare(step.config)
+        
+        with self._workflows_lock:
+            self._prepared_steps[step.id] = run_step
+            if len(self._prepared_steps) > self.PREPARED_STEP_CACHE_SIZE:
+                self._prepared_steps.popitem(last=False)
+        return run_step
+    
     def _fail_step(
         self,
         step_exec_id: UUID,
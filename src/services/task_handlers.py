@@ -6,13 +6,62 @@ The registry allows for dynamic handler registration.
 """
 
 import logging
+import string
 import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Type
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple, Type
 import json
 
 logger = logging.getLogger(__name__)
 
+# A step bound to its config: (input_data, timeout) -> output
+PreparedStep = Callable[[Dict[str, Any], int], Optional[Dict[str, Any]]]
+
+_formatter = string.Formatter()
+
+
+@lru_cache(maxsize=1024)
+def _compile_template(template: str) -> Tuple[str, ...]:
+    """
+    Return the top-level input keys referenced by a format template.
+    
+    "users/{user.id}/{page}" -> ("user", "page"). Results are cached
+    since the same step templates are rendered on every execution.
+    """
+    fields = []
+    for _, field_name, format_spec, _ in _formatter.parse(template):
+        if field_name is None:
+            continue
+        root = field_name.split(".", 1)[0].split("[", 1)[0]
+        if root not in fields:
+            fields.append(root)
+        if format_spec and "{" in format_spec:
+            for nested in _compile_template(format_spec):
+                if nested not in fields:
+                    fields.append(nested)
+    return tuple(fields)
+
+
+def _render_template(template: str, data: Dict[str, Any]) -> str:
+    """Substitute placeholders using only the keys the template references."""
+    fields = _compile_template(template)
+    return template.format_map({k: data[k] for k in fields if k in data})
+
+
+class StepDeferred(Exception):
+    """
+    Raised by a handler to finish its step later instead of blocking.
+    
+    The orchestrator records the step as completed with `output` and
+    stops; the worker re-enqueues the execution after `seconds`.
+    """
+    
+    def __init__(self, seconds: float, output: Optional[Dict[str, Any]] = None):
+        self.seconds = seconds
+        self.output = output
+        super().__init__(f"Step deferred for {seconds} seconds")
+
 
 class TaskHandler(ABC):
     """
@@ -51,6 +100,18 @@ class TaskHandler(ABC):
         """
         pass
     
+    def prepare(self, step_config: Dict[str, Any]) -> PreparedStep:
+        """
+        Bind this handler to a fixed step configuration.
+        
+        Returns a callable taking (input_data, timeout). Handlers with
+        config-dependent setup can override this to do it once per step
+        rather than on every execution.
+        """
+        def run(input_data: Dict[str, Any], timeout: int = 300) -> Optional[Dict[str, Any]]:
+            return self.execute(step_config, input_data, timeout)
+        return run
+    
     def validate_config(self, config: Dict[str, Any]) -> bool:
         """Validate step configuration. Override in subclasses."""
         return True
@@ -108,42 +169,55 @@ class HttpRequestHandler(TaskHandler):
         input_data: Dict[str, Any],
         timeout: int = 300,
     ) -> Optional[Dict[str, Any]]:
+        return self.prepare(step_config)(input_data, timeout)
+    
+    def prepare(self, step_config: Dict[str, Any]) -> PreparedStep:
+        """Resolve method, headers, body and URL template once per step."""
         import requests
         
-        url = step_config.get("url")
+        url_template = step_config.get("url")
         method = step_config.get("method", "GET").upper()
         headers = step_config.get("headers", {})
-        body = step_config.get("body")
-        expected_status = step_config.get("expected_status", [200, 201, 204])
+        body = step_config.get("body") or None
+        expected_status = frozenset(step_config.get("expected_status", [200, 201, 204]))
         
         # Support template substitution in URL
-        if "{" in url:
-            url = url.format(**input_data)
-        
-        logger.info(f"Making {method} request to {url}")
-        
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=headers,
-            json=body if body else None,
-            timeout=timeout,
-        )
+        url_fields = _compile_template(url_template) if "{" in url_template else None
         
-        if response.status_code not in expected_status:
-            raise Exception(
-                f"HTTP request failed with status {response.status_code}: {response.text}"
+        def run(input_data: Dict[str, Any], timeout: int = 300) -> Optional[Dict[str, Any]]:
+            if url_fields is None:
+                url = url_template
+            else:
+                url = url_template.format_map(
+                    {k: input_data[k] for k in url_fields if k in input_data}
+                )
+            
+            logger.info(f"Making {method} request to {url}")
+            
+            response = requests.request(
+                method=method,
+                url=url,
+                headers=headers,
+                json=body,
+                timeout=timeout,
             )
+            
+            if response.status_code not in expected_status:
+                raise Exception(
+                    f"HTTP request failed with status {response.status_code}: {response.text}"
+                )
+            
+            try:
+                response_data = response.json()
+            except json.JSONDecodeError:
+                response_data = {"text": response.text}
+            
+            return {
+                "status_code": response.status_code,
+                "response": response_data,
+            }
         
-        try:
-            response_data = response.json()
-        except json.JSONDecodeError:
-            response_data = {"text": response.text}
-        
-        return {
-            "status_code": response.status_code,
-            "response": response_data,
-        }
+        return run
 
 
 class DataTransformHandler(TaskHandler):
@@ -219,8 +293,15 @@ class DelayHandler(TaskHandler):
     {
         "seconds": 5
     }
+    
+    Delays longer than `max_inline_seconds` raise StepDeferred so the
+    worker can reschedule the execution instead of sleeping on it.
+    With no threshold every delay sleeps inline.
     """
     
+    def __init__(self, max_inline_seconds: Optional[float] = None):
+        self.max_inline_seconds = max_inline_seconds
+    
     @property
     def task_type(self) -> str:
         return "delay"
@@ -232,9 +313,15 @@ class DelayHandler(TaskHandler):
         timeout: int = 300,
     ) -> Optional[Dict[str, Any]]:
         seconds = step_config.get("seconds", 1)
+        output = {"delayed_seconds": seconds}
+        
+        if self.max_inline_seconds is not None and seconds > self.max_inline_seconds:
+            logger.info(f"Deferring for {seconds} seconds")
+            raise StepDeferred(seconds, output)
+        
         logger.info(f"Delaying for {seconds} seconds")
         time.sleep(seconds)
-        return {"delayed_seconds": seconds}
+        return output
 
 
 class ConditionalHandler(TaskHandler):
@@ -313,9 +400,10 @@ class LogHandler(TaskHandler):
         message = step_config.get("message", "Log step executed")
         level = step_config.get("level", "info")
         
-        # Template substitution
+        # Template substitution; "}}" alone still renders as "}"
         try:
-            message = message.format(**input_data)
+            if "{" in message or "}" in message:
+                message = _render_template(message, input_data)
         except KeyError:
             pass
         
@@ -325,13 +413,21 @@ class LogHandler(TaskHandler):
         return {"logged_message": message, "level": level}
 
 
-def create_default_registry() -> TaskHandlerRegistry:
-    """Create a registry with all built-in handlers."""
+def create_default_registry(
+    max_inline_delay: Optional[float] = None,
+) -> TaskHandlerRegistry:
+    """
+    Create a registry with all built-in handlers.
+    
+    Args:
+        max_inline_delay: Longest delay step (in seconds) to sleep through;
+            longer delays are deferred. None sleeps for every delay.
+    """
     registry = TaskHandlerRegistry()
     
     registry.register(HttpRequestHandler())
     registry.register(DataTransformHandler())
-    registry.register(DelayHandler())
+    registry.register(DelayHandler(max_inline_seconds=max_inline_delay))
     registry.register(ConditionalHandler())
     registry.register(LogHandler())
     
@@ -5,14 +5,14 @@ Provides reliable message queuing with visibility timeout,
 dead letter queue support, and idempotent processing.
 """
 
-import json
 import logging
 import time
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 from uuid import UUID, uuid4
 
+import orjson
 import redis
 
 from src.config import get_config
@@ -20,45 +20,129 @@ from src.config import get_config
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+# Pops up to ARGV[2] messages, ready delayed messages first and then the
+# oldest from the main queue, moving them onto the processing list in the
+# same call. Returns the popped messages (possibly none).
+# KEYS: delayed zset, main queue, processing list.
+# ARGV: current timestamp, max messages.
+_DEQUEUE_SCRIPT = """
+local count = tonumber(ARGV[2])
+local popped = {}
+local ready = redis.call('ZRANGEBYSCORE', KEYS[1], 0, ARGV[1], 'LIMIT', 0, count)
+for _, raw in ipairs(ready) do
+    redis.call('ZREM', KEYS[1], raw)
+    redis.call('LPUSH', KEYS[3], raw)
+    popped[#popped + 1] = raw
+end
+while #popped < count do
+    local raw = redis.call('RPOPLPUSH', KEYS[2], KEYS[3])
+    if not raw then
+        break
+    end
+    popped[#popped + 1] = raw
+end
+return popped
+"""
+
+# Moves a message from the processing list into the in-flight hash and
+# records its visibility deadline. Only claims if the message was still on
+# the list, so a worker and a recovery sweep can't both register it.
+# KEYS: processing list, in-flight hash, deadlines zset.
+# ARGV: raw message, message id, deadline timestamp.
+_CLAIM_SCRIPT = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[1])
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[2])
+return 1
+"""
+
+# Takes every in-flight message whose visibility deadline has passed out of
+# the in-flight set and back onto the processing list, returning them. The
+# caller requeues each one with _REQUEUE_SCRIPT; if it dies first, they are
+# still on the processing list for the next recovery to pick up.
+# KEYS: deadlines zset, in-flight hash, processing list. ARGV: current timestamp.
+_RECOVER_SCRIPT = """
+local stale = {}
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], 0, ARGV[1])) do
+    local raw = redis.call('HGET', KEYS[2], id)
+    redis.call('ZREM', KEYS[1], id)
+    if raw then
+        redis.call('HDEL', KEYS[2], id)
+        redis.call('LPUSH', KEYS[3], raw)
+        stale[#stale + 1] = raw
+    end
+end
+return stale
+"""
+
+# Replaces a message on the processing list with an updated copy pushed onto
+# another list, unless something else already took it off the processing list.
+# KEYS: processing list, destination list. ARGV: raw message, updated message.
+_REQUEUE_SCRIPT = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+redis.call('LPUSH', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+@dataclass(slots=True, frozen=True)
 class QueueMessage:
     """
     Represents a message in the task queue.
     
     Contains metadata for tracking processing state and retries.
+    Uses __slots__ since messages are allocated on every dequeue. Frozen:
+    use with_attempt / for_dlq to derive the retried or dead-lettered copy.
     """
     id: str
-    execution_id: str
+    execution_id: UUID
     task_type: str
     payload: Dict[str, Any]
     created_at: float
     attempt: int = 1
     visibility_timeout: int = 30
     
-    def to_json(self) -> str:
-        """Serialize message to JSON."""
-        return json.dumps({
-            "id": self.id,
-            "execution_id": self.execution_id,
-            "task_type": self.task_type,
-            "payload": self.payload,
-            "created_at": self.created_at,
-            "attempt": self.attempt,
-            "visibility_timeout": self.visibility_timeout,
-        })
+    def to_json(self) -> bytes:
+        """
+        Serialize message to JSON (UTF-8 encoded).
+        
+        execution_id is written as hex, like message ids; orjson would
+        hyphenate a UUID field. Non-string payload keys are stringified,
+        as json.dumps did.
+        """
+        return orjson.dumps(
+            {
+                "id": self.id,
+                "execution_id": self.execution_id.hex,
+                "task_type": self.task_type,
+                "payload": self.payload,
+                "created_at": self.created_at,
+                "attempt": self.attempt,
+                "visibility_timeout": self.visibility_timeout,
+            },
+            option=orjson.OPT_NON_STR_KEYS,
+        )
     
     @classmethod
-    def from_json(cls, data: str) -> "QueueMessage":
-        """Deserialize message from JSON."""
-        obj = json.loads(data)
+    def from_json(cls, data: Union[str, bytes]) -> "QueueMessage":
+        """
+        Deserialize message from JSON.
+        
+        to_json always writes every field, so no defaults are needed here.
+        """
+        obj = orjson.loads(data)
         return cls(
-            id=obj["id"],
-            execution_id=obj["execution_id"],
-            task_type=obj["task_type"],
-            payload=obj["payload"],
-            created_at=obj["created_at"],
-            attempt=obj.get("attempt", 1),
-            visibility_timeout=obj.get("visibility_timeout", 30),
+            obj["id"],
+            UUID(obj["execution_id"]),
+            obj["task_type"],
+            obj["payload"],
+            obj["created_at"],
+            obj["attempt"],
+            obj["visibility_timeout"],
         )
     
     @classmethod
@@ -71,13 +155,21 @@ class QueueMessage:
     ) -> "QueueMessage":
         """Factory method to create a new message."""
         return cls(
-            id=str(uuid4()),
-            execution_id=str(execution_id),
+            id=uuid4().hex,
+            execution_id=execution_id if isinstance(execution_id, UUID) else UUID(execution_id),
             task_type=task_type,
             payload=payload or {},
             created_at=time.time(),
             visibility_timeout=visibility_timeout,
         )
+    
+    def with_attempt(self, attempt: int) -> "QueueMessage":
+        """Copy of this message for another delivery attempt."""
+        return replace(self, attempt=attempt)
+    
+    def for_dlq(self, reason: str, **details: Any) -> "QueueMessage":
+        """Copy of this message with the dead-letter reason in its payload."""
+        return replace(self, payload={**self.payload, "dlq_reason": reason, **details})
 
 
 class TaskQueue:
@@ -89,6 +181,11 @@ class TaskQueue:
     - Visibility timeout (messages return if not acknowledged)
     - Dead letter queue for failed messages
     - Idempotency checking
+    
+    In-flight messages live in a hash keyed by message id, with visibility
+    deadlines in a sorted set, so acknowledging is O(1) regardless of how
+    many messages are in flight. The processing list only holds messages
+    for the instant between the atomic pop and the claim into the hash.
     """
     
     def __init__(
@@ -100,11 +197,34 @@ class TaskQueue:
         self.redis_url = redis_url or config.REDIS_URL
         self.queue_name = queue_name or config.QUEUE_NAME
         self.processing_queue = f"{self.queue_name}:processing"
+        self.processing_hash = f"{self.queue_name}:inflight"
+        self.processing_deadlines = f"{self.queue_name}:deadlines"
+        self.delayed_queue = f"{self.queue_name}:delayed"
         self.dlq_name = f"{self.queue_name}:dlq"
         self.idempotency_prefix = f"{self.queue_name}:idempotency"
         self.visibility_timeout = config.QUEUE_PROCESSING_TIMEOUT
         
         self._redis: Optional[redis.Redis] = None
+        self._blocking_redis: Optional[redis.Redis] = None
+        self._dequeue_script = None
+        self._claim_script = None
+        self._recover_script = None
+        self._requeue_script = None
+    
+    @property
+    def blocking_redis(self) -> redis.Redis:
+        """
+        Get or create the connection used for blocking pops.
+        
+        Kept separate so interrupt() can wake a blocked dequeue without
+        disturbing other commands.
+        """
+        if self._blocking_redis is None:
+            self._blocking_redis = redis.from_url(
+                self.redis_url,
+                decode_responses=True,
+            )
+        return self._blocking_redis
     
     @property
     def redis(self) -> redis.Redis:
@@ -114,10 +234,31 @@ class TaskQueue:
                 self.redis_url,
                 decode_responses=True,
             )
+            self._dequeue_script = self._redis.register_script(_DEQUEUE_SCRIPT)
+            self._claim_script = self._redis.register_script(_CLAIM_SCRIPT)
+            self._recover_script = self._redis.register_script(_RECOVER_SCRIPT)
+            self._requeue_script = self._redis.register_script(_REQUEUE_SCRIPT)
         return self._redis
     
+    def interrupt(self) -> None:
+        """
+        Wake a blocked dequeue, which then returns no messages.
+        
+        Only the blocking connection is closed, so this is safe to call from
+        a signal handler or another thread while other commands are running.
+        """
+        if self._blocking_redis is not None:
+            blocking_redis, self._blocking_redis = self._blocking_redis, None
+            blocking_redis.close()
+    
     def close(self) -> None:
-        """Close Redis connection."""
+        """
+        Close Redis connections.
+        
+        A dequeue blocked in another thread returns immediately with no
+        messages.
+        """
+        self.interrupt()
         if self._redis is not None:
             self._redis.close()
             self._redis = None
@@ -128,7 +269,7 @@ class TaskQueue:
         task_type: str = "execute_workflow",
         payload: Optional[Dict[str, Any]] = None,
         idempotency_key: Optional[str] = None,
-        delay_seconds: int = 0,
+        delay_seconds: float = 0,
     ) -> Optional[QueueMessage]:
         """
         Add a message to the queue.
@@ -143,14 +284,12 @@ class TaskQueue:
         Returns:
             The queued message, or None if duplicate
         """
-        # Check idempotency
+        # Check idempotency (key expires after 24 hours)
         if idempotency_key:
             idem_key = f"{self.idempotency_prefix}:{idempotency_key}"
-            if not self.redis.setnx(idem_key, "1"):
+            if not self.redis.set(idem_key, "1", nx=True, ex=86400):
                 logger.info(f"Duplicate message rejected: {idempotency_key}")
                 return None
-            # Set TTL for idempotency key (24 hours)
-            self.redis.expire(idem_key, 86400)
         
         message = QueueMessage.create(
             execution_id=execution_id,
@@ -162,7 +301,7 @@ class TaskQueue:
         if delay_seconds > 0:
             # Use sorted set for delayed messages
             score = time.time() + delay_seconds
-            self.redis.zadd(f"{self.queue_name}:delayed", {message.to_json(): score})
+            self.redis.zadd(self.delayed_queue, {message.to_json(): score})
             logger.info(f"Enqueued delayed message {message.id} for {delay_seconds}s")
         else:
             self.redis.lpush(self.queue_name, message.to_json())
@@ -174,49 +313,111 @@ class TaskQueue:
         """
         Get a message from the queue.
         
-        Uses BRPOPLPUSH for atomic move to processing queue.
         Returns None if no message available within timeout.
+        See dequeue_batch for how messages are claimed.
         """
-        # First, move any ready delayed messages
-        self._move_ready_delayed_messages()
-        
-        # Try to get a message
-        result = self.redis.brpoplpush(
-            self.queue_name,
-            self.processing_queue,
-            timeout=timeout,
-        )
+        messages = self.dequeue_batch(1, timeout=timeout)
+        return messages[0] if messages else None
+    
+    def dequeue_batch(self, max_messages: int, timeout: float = 5) -> List[QueueMessage]:
+        """
+        Get up to max_messages from the queue.
         
-        if not result:
-            return None
+        A single script call claims ready delayed messages and queued ones.
+        If both are empty, falls back to BLMOVE to block until a message
+        arrives (or the next delayed message is due, if sooner than timeout),
+        then drains whatever else is ready. Either way messages are moved
+        onto the processing queue atomically, then claimed into the
+        in-flight hash in one pipeline.
+        Returns an empty list if no message available within timeout or the
+        queue was closed while waiting; never waits for a batch to fill once
+        a message is available.
+        """
+        redis_client = self.redis
+        raws = self._pop_ready(max_messages)
         
-        message = QueueMessage.from_json(result)
+        if not raws:
+            try:
+                first = self.blocking_redis.blmove(
+                    self.queue_name,
+                    self.processing_queue,
+                    self._block_timeout(timeout),
+                    src="RIGHT",
+                    dest="LEFT",
+                )
+            except Exception:
+                # Closing the socket mid-read can surface as a connection
+                # error or an I/O error, depending on where the read was
+                if self._blocking_redis is None:
+                    return []  # Closed while waiting
+                raise
+            if not first:
+                return []
+            raws = [first]
+            if max_messages > 1:
+                raws.extend(self._pop_ready(max_messages - 1))
         
-        # Set visibility timeout
-        self.redis.setex(
-            f"{self.processing_queue}:{message.id}",
-            message.visibility_timeout,
-            result,
-        )
+        # Track as in-flight with a visibility deadline. Undecodable payloads
+        # go to the DLQ one by one rather than stranding the whole batch on
+        # the processing list.
+        messages = []
+        pipe = redis_client.pipeline(transaction=False)
+        for raw in raws:
+            message = self._decode(raw)
+            if message is None:
+                self._dead_letter_raw(raw, client=pipe)
+                continue
+            self._claim(raw, message, client=pipe)
+            messages.append(message)
+        pipe.execute()
         
-        logger.debug(f"Dequeued message {message.id}")
-        return message
+        logger.debug(f"Dequeued {len(messages)} message(s)")
+        return messages
+    
+    def extend_visibility(self, message: QueueMessage) -> bool:
+        """
+        Restart an in-flight message's visibility timeout from now.
+        
+        Only updates a message that is still in flight (ZADD XX), so one
+        already acknowledged or recovered isn't brought back.
+        Returns True if the deadline was moved.
+        """
+        moved = self.redis.zadd(
+            self.processing_deadlines,
+            {message.id: time.time() + message.visibility_timeout},
+            xx=True,
+            ch=True,
+        )
+        return bool(moved)
     
     def acknowledge(self, message: QueueMessage) -> bool:
         """
         Acknowledge successful processing of a message.
         
-        Removes message from processing queue.
+        Removes message from the in-flight set.
         """
-        # Remove from processing queue
-        self.redis.lrem(self.processing_queue, 1, message.to_json())
-        
-        # Delete visibility timeout key
-        self.redis.delete(f"{self.processing_queue}:{message.id}")
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hdel(self.processing_hash, message.id)
+        pipe.zrem(self.processing_deadlines, message.id)
+        pipe.execute()
         
         logger.debug(f"Acknowledged message {message.id}")
         return True
     
+    def acknowledge_batch(self, messages: List[QueueMessage]) -> bool:
+        """Acknowledge several messages in a single round trip."""
+        if not messages:
+            return True
+        
+        ids = [message.id for message in messages]
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hdel(self.processing_hash, *ids)
+        pipe.zrem(self.processing_deadlines, *ids)
+        pipe.execute()
+        
+        logger.debug(f"Acknowledged {len(ids)} message(s)")
+        return True
+    
     def reject(
         self,
         message: QueueMessage,
@@ -231,21 +432,51 @@ class TaskQueue:
             requeue: If True, put back in main queue for retry
             send_to_dlq: If True, send to dead letter queue
         """
-        # Remove from processing queue
-        self.redis.lrem(self.processing_queue, 1, message.to_json())
-        self.redis.delete(f"{self.processing_queue}:{message.id}")
+        return self.reject_batch([message], requeue=requeue, send_to_dlq=send_to_dlq)
+    
+    def reject_batch(
+        self,
+        messages: List[QueueMessage],
+        requeue: bool = True,
+        send_to_dlq: bool = False,
+    ) -> bool:
+        """
+        Reject several messages in a single round trip.
+        
+        Removal from the in-flight set and the move to the main queue or
+        DLQ happen in one MULTI/EXEC, so a dropped connection can't leave
+        a message removed but not requeued.
+        
+        Args:
+            messages: The messages to reject
+            requeue: If True, put back in main queue for retry
+            send_to_dlq: If True, send to dead letter queue
+        """
+        if not messages:
+            return True
+        
+        ids = [message.id for message in messages]
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hdel(self.processing_hash, *ids)
+        pipe.zrem(self.processing_deadlines, *ids)
         
         if send_to_dlq:
             # Send to dead letter queue
-            message.payload["dlq_reason"] = "rejected"
-            message.payload["dlq_timestamp"] = time.time()
-            self.redis.lpush(self.dlq_name, message.to_json())
-            logger.warning(f"Message {message.id} sent to DLQ")
+            now = time.time()
+            messages = [m.for_dlq("rejected", dlq_timestamp=now) for m in messages]
+            pipe.lpush(self.dlq_name, *(message.to_json() for message in messages))
         elif requeue:
             # Increment attempt and requeue
-            message.attempt += 1
-            self.redis.lpush(self.queue_name, message.to_json())
-            logger.info(f"Message {message.id} requeued (attempt {message.attempt})")
+            messages = [m.with_attempt(m.attempt + 1) for m in messages]
+            pipe.lpush(self.queue_name, *(message.to_json() for message in messages))
+        
+        pipe.execute()
+        
+        for message in messages:
+            if send_to_dlq:
+                logger.warning(f"Message {message.id} sent to DLQ")
+            elif requeue:
+                logger.info(f"Message {message.id} requeued (attempt {message.attempt})")
         
         return True
     
@@ -255,70 +486,146 @@ class TaskQueue:
     
     def get_processing_length(self) -> int:
         """Get the number of messages being processed."""
-        return self.redis.llen(self.processing_queue)
+        return self.redis.hlen(self.processing_hash)
     
     def get_dlq_length(self) -> int:
         """Get the number of messages in the dead letter queue."""
         return self.redis.llen(self.dlq_name)
     
+    def get_lengths(self) -> Dict[str, int]:
+        """Get the main, processing and DLQ lengths in a single round trip."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.llen(self.queue_name)
+        pipe.hlen(self.processing_hash)
+        pipe.llen(self.dlq_name)
+        queue_length, processing_length, dlq_length = pipe.execute()
+        return {
+            "queue_length": queue_length,
+            "processing_length": processing_length,
+            "dlq_length": dlq_length,
+        }
+    
     def recover_stale_messages(self) -> int:
         """
         Recover messages that have exceeded visibility timeout.
         
         These are messages where processing started but never completed.
+        Messages left on the processing list (worker died between pop and
+        claim) are claimed first so their deadline can lapse normally.
+        Stale messages are collected in one script call and requeued in one
+        pipeline, so recovery costs the same few round trips however many
+        messages it finds. Undecodable messages are moved to the DLQ as-is.
         Returns the number of recovered messages.
         """
-        recovered = 0
-        messages = self.redis.lrange(self.processing_queue, 0, -1)
+        redis_client = self.redis
+        for msg_json in redis_client.lrange(self.processing_queue, 0, -1):
+            message = self._decode(msg_json)
+            if message is None:
+                self._dead_letter_raw(msg_json)
+            else:
+                self._claim(msg_json, message)
         
-        for msg_json in messages:
-            message = QueueMessage.from_json(msg_json)
-            timeout_key = f"{self.processing_queue}:{message.id}"
+        stale = self._recover_script(
+            keys=[self.processing_deadlines, self.processing_hash, self.processing_queue],
+            args=[time.time()],
+            client=redis_client,
+        )
+        if not stale:
+            return 0
+        
+        pipe = redis_client.pipeline(transaction=False)
+        messages = []
+        for msg_json in stale:
+            stale_message = self._decode(msg_json)
+            if stale_message is None:
+                self._dead_letter_raw(msg_json, client=pipe)
+                messages.append(None)
+                continue
+            
+            # Requeue with incremented attempt, or send to DLQ
+            message = stale_message.with_attempt(stale_message.attempt + 1)
+            if message.attempt <= 3:  # Max 3 attempts
+                destination = self.queue_name
+            else:
+                message = message.for_dlq("max_attempts_exceeded")
+                destination = self.dlq_name
+            
+            self._requeue_script(
+                keys=[self.processing_queue, destination],
+                args=[msg_json, message.to_json()],
+                client=pipe,
+            )
+            messages.append(message)
+        
+        recovered = 0
+        for message, moved in zip(messages, pipe.execute()):
+            # Already claimed back by a concurrent recovery, or undecodable
+            if not moved or message is None:
+                continue
             
-            # If timeout key doesn't exist, message is stale
-            if not self.redis.exists(timeout_key):
-                self.redis.lrem(self.processing_queue, 1, msg_json)
-                
-                # Requeue with incremented attempt
-                message.attempt += 1
-                if message.attempt <= 3:  # Max 3 attempts
-                    self.redis.lpush(self.queue_name, message.to_json())
-                    logger.warning(f"Recovered stale message {message.id}")
-                else:
-                    # Send to DLQ
-                    message.payload["dlq_reason"] = "max_attempts_exceeded"
-                    self.redis.lpush(self.dlq_name, message.to_json())
-                    logger.warning(f"Stale message {message.id} sent to DLQ")
-                
-                recovered += 1
+            if message.attempt <= 3:
+                logger.warning(f"Recovered stale message {message.id}")
+            else:
+                logger.warning(f"Stale message {message.id} sent to DLQ")
+            recovered += 1
         
         return recovered
     
-    def _move_ready_delayed_messages(self) -> int:
-        """Move delayed messages that are ready to the main queue."""
-        now = time.time()
-        delayed_queue = f"{self.queue_name}:delayed"
-        
-        # Get messages with score <= now
-        messages = self.redis.zrangebyscore(delayed_queue, 0, now)
-        
-        if not messages:
-            return 0
+    def _block_timeout(self, timeout: float) -> float:
+        """Shorten a blocking pop's timeout to wake when the next delayed message is due."""
+        upcoming = self.redis.zrange(self.delayed_queue, 0, 0, withscores=True)
+        if not upcoming:
+            return timeout
         
-        pipe = self.redis.pipeline()
-        for msg_json in messages:
-            pipe.lpush(self.queue_name, msg_json)
-            pipe.zrem(delayed_queue, msg_json)
-        pipe.execute()
+        # 0 would block forever, so wait at least a few milliseconds
+        due_in = max(upcoming[0][1] - time.time(), 0.01)
+        return min(timeout, due_in) if timeout else due_in
+    
+    def _pop_ready(self, max_messages: int) -> List[str]:
+        """Pop up to max_messages without blocking, onto the processing list."""
+        return self._dequeue_script(
+            keys=[self.delayed_queue, self.queue_name, self.processing_queue],
+            args=[time.time(), max_messages],
+            client=self.redis,
+        )
+    
+    def _decode(self, raw: str) -> Optional[QueueMessage]:
+        """Decode a raw message, or log and return None if it can't be decoded."""
+        try:
+            return QueueMessage.from_json(raw)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Undecodable message sent to DLQ: {e}: {raw[:200]!r}")
+            return None
+    
+    def _dead_letter_raw(self, raw: str, client=None):
+        """Move a raw message from the processing list to the DLQ unchanged."""
+        return self._requeue_script(
+            keys=[self.processing_queue, self.dlq_name],
+            args=[raw, raw],
+            client=client or self.redis,
+        )
+    
+    def _claim(self, raw: str, message: QueueMessage, client=None):
+        """
+        Move a popped message from the processing list to the in-flight set.
         
-        return len(messages)
+        Pass a pipeline as client to batch claims; the result then comes
+        from the pipeline's execute().
+        """
+        return self._claim_script(
+            keys=[self.processing_queue, self.processing_hash, self.processing_deadlines],
+            args=[raw, message.id, time.time() + message.visibility_timeout],
+            client=client or self.redis,
+        )
     
     def clear_all(self) -> None:
         """Clear all queues. Use with caution - mainly for testing."""
         self.redis.delete(self.queue_name)
         self.redis.delete(self.processing_queue)
+        self.redis.delete(self.processing_hash)
+        self.redis.delete(self.processing_deadlines)
         self.redis.delete(self.dlq_name)
-        self.redis.delete(f"{self.queue_name}:delayed")
+        self.redis.delete(self.delayed_queue)
         logger.warning("All queues cleared")
     
     def health_check(self) -> bool:
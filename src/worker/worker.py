@@ -8,8 +8,8 @@ import logging
 import signal
 import threading
 import time
-from typing import Optional
-from uuid import UUID
+from queue import Empty, Queue
+from typing import Dict, List, Optional, Tuple
 
 from src.config import get_config
 from src.persistence import Database, WorkflowRepository, ExecutionRepository, LogRepository
@@ -26,11 +26,17 @@ class Worker:
     
     Features:
     - Graceful shutdown on SIGTERM/SIGINT
-    - Configurable concurrency (via multiple worker instances)
+    - Configurable concurrency (WORKER_CONCURRENCY handler threads per process)
     - Automatic retry handling
     - Health check endpoint support
     """
     
+    # How long a health probe result is reused, in seconds
+    HEALTH_CACHE_TTL = 2.0
+    
+    # How often stale messages are recovered, in seconds
+    RECOVERY_INTERVAL = 60
+    
     def __init__(
         self,
         queue: Optional[TaskQueue] = None,
@@ -47,7 +53,9 @@ class Worker:
         self.log_repo = LogRepository(self.db)
         
         # Create orchestrator with task registry
-        self.task_registry = create_default_registry()
+        self.task_registry = create_default_registry(
+            max_inline_delay=self.config.DELAY_INLINE_MAX_SECONDS,
+        )
         self.orchestrator = WorkflowOrchestrator(
             workflow_repo=self.workflow_repo,
             execution_repo=self.execution_repo,
@@ -58,27 +66,72 @@ class Worker:
         # Worker state
         self._running = False
         self._shutdown_event = threading.Event()
-        self._current_message: Optional[QueueMessage] = None
+        self._in_flight: Dict[str, QueueMessage] = {}
+        
+        # Prefetched messages, shared by all handler threads. A single queue
+        # balances work on its own: whichever thread frees up first takes
+        # the next message, so there is nothing to steal or redistribute.
+        # Each thread's next message is already claimed while it executes
+        # the current one, and its visibility timeout restarts when a thread
+        # takes it; if the worker dies, recovery requeues both.
+        self.concurrency = max(1, self.config.WORKER_CONCURRENCY)
+        prefetch = max(1, self.config.WORKER_PREFETCH)
+        self._local_queue: Queue = Queue(maxsize=prefetch * self.concurrency)
+        
+        # Finished messages waiting to be acknowledged or rejected in batches
+        self._ack_lock = threading.Lock()
+        self._pending_acks: List[QueueMessage] = []
+        self._pending_rejects: List[QueueMessage] = []
+        self._ack_deadline = 0.0
+        
+        # Local counters (guarded by _ack_lock) and queue-wide lengths,
+        # refreshed alongside recovery rather than on every get_stats()
+        self._processed = 0
+        self._failed = 0
+        self._queue_lengths: Optional[Dict[str, int]] = None
+        self._last_recovery = time.monotonic()
+        
+        # (monotonic time, db healthy, queue healthy) of the last probe
+        self._health_lock = threading.Lock()
+        self._health_cache: Optional[Tuple[float, bool, bool]] = None
     
     def start(self) -> None:
-        """Start the worker loop."""
+        """
+        Start the worker.
+        
+        The calling thread prefetches batches from Redis into a bounded
+        local queue that the handler threads take messages from.
+        """
         self._running = True
         self._setup_signal_handlers()
         
-        logger.info("Worker started, waiting for tasks...")
+        logger.info("Worker started with %d handler threads, waiting for tasks...", self.concurrency)
         
-        # Start recovery thread for stale messages
-        recovery_thread = threading.Thread(target=self._recovery_loop, daemon=True)
-        recovery_thread.start()
+        handler_threads = [
+            threading.Thread(target=self._handler_loop, name=f"worker-handler-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in handler_threads:
+            thread.start()
         
-        # Main processing loop
+        # Main prefetch loop; the dequeue timeout bounds how late recovery
+        # runs, and is cut short when buffered acks fall due, so they go out
+        # on time even while every handler is busy
         while self._running:
             try:
-                self._process_one()
+                self._prefetch()
+                self._flush_acks()
+                self._maybe_recover()
             except Exception as e:
-                logger.exception(f"Error in worker loop: {e}")
+                logger.exception("Error in worker loop: %s", e)
                 time.sleep(1)  # Brief pause on error
         
+        # Let the handlers finish what was already claimed
+        for thread in handler_threads:
+            thread.join()
+        self._flush_acks(force=True)
+        self.queue.close()
+        
         logger.info("Worker stopped")
     
     def stop(self) -> None:
@@ -86,107 +139,304 @@ class Worker:
         logger.info("Stopping worker...")
         self._running = False
         self._shutdown_event.set()
+        
+        # Unblock the prefetcher if it's waiting on Redis. This may run in a
+        # signal handler on the prefetcher's own thread, so leave the shared
+        # connection alone - handler threads still need it to drain.
+        self.queue.interrupt()
     
     def _setup_signal_handlers(self) -> None:
         """Set up signal handlers for graceful shutdown."""
         def handler(signum, frame):
-            logger.info(f"Received signal {signum}, initiating shutdown...")
+            logger.info("Received signal %s, initiating shutdown...", signum)
             self.stop()
         
         signal.signal(signal.SIGTERM, handler)
         signal.signal(signal.SIGINT, handler)
     
-    def _process_one(self) -> bool:
+    def _prefetch(self) -> int:
         """
-        Process a single message from the queue.
+        Claim a batch of messages and hand them to the handler threads.
         
-        Returns True if a message was processed, False otherwise.
+        Only claims as many messages as the local queue has room for, so
+        none sit claimed behind a full buffer with their visibility timeout
+        running.
+        
+        Returns the number of messages prefetched.
         """
-        message = self.queue.dequeue(timeout=5)
+        free_slots = self._local_queue.maxsize - self._local_queue.qsize()
+        if free_slots <= 0:
+            self._shutdown_event.wait(0.1)
+            return 0
         
-        if not message:
-            return False
+        messages = self.queue.dequeue_batch(
+            min(free_slots, self.config.QUEUE_BATCH_SIZE),
+            timeout=self._until_ack_deadline(5),
+        )
+        for message in messages:
+            self._local_queue.put(message)
         
-        self._current_message = message
+        return len(messages)
+    
+    def _until_ack_deadline(self, timeout: float) -> float:
+        """Shorten a wait to end when the buffered acks are due, if any are buffered."""
+        with self._ack_lock:
+            if not self._pending_acks and not self._pending_rejects:
+                return timeout
+            due_in = self._ack_deadline - time.monotonic()
+        
+        # 0 would block forever, so wait at least a few milliseconds
+        return min(timeout, max(due_in, 0.01))
+    
+    def _handler_loop(self) -> None:
+        """Process prefetched messages until the worker stops and the buffer is drained."""
+        while self._running or not self._local_queue.empty():
+            try:
+                message = self._local_queue.get(timeout=0.1)
+            except Empty:
+                self._flush_acks()
+                continue
+            
+            try:
+                # The visibility window started at claim time, while the
+                # message waited in the buffer; restart it now it's running
+                self.queue.extend_visibility(message)
+                self._settle(message, succeeded=self._process_one(message))
+            except Exception as e:
+                logger.exception("Error in handler thread: %s", e)
+    
+    def _settle(self, message: QueueMessage, succeeded: bool) -> None:
+        """Buffer a finished message for the next batch acknowledge or reject."""
+        with self._ack_lock:
+            if not self._pending_acks and not self._pending_rejects:
+                self._ack_deadline = time.monotonic() + self.config.QUEUE_BATCH_MAX_DELAY_MS / 1000
+            if succeeded:
+                self._pending_acks.append(message)
+                self._processed += 1
+            else:
+                self._pending_rejects.append(message)
+                self._failed += 1
+        
+        self._flush_acks()
+    
+    def _flush_acks(self, force: bool = False) -> None:
+        """
+        Acknowledge and reject buffered messages.
+        
+        Unless forced, waits until a full batch is buffered or the oldest
+        buffered message has waited QUEUE_BATCH_MAX_DELAY_MS.
+        
+        Never raises: if Redis fails, whatever wasn't flushed goes back in
+        the buffers, so the handler threads keep running and the next call
+        retries. Messages still unflushed at shutdown stay in flight until
+        recovery requeues them.
+        """
+        with self._ack_lock:
+            pending = len(self._pending_acks) + len(self._pending_rejects)
+            if not pending:
+                return
+            if (
+                not force
+                and pending < self.config.QUEUE_BATCH_SIZE
+                and time.monotonic() < self._ack_deadline
+            ):
+                return
+            acks, self._pending_acks = self._pending_acks, []
+            rejects, self._pending_rejects = self._pending_rejects, []
+        
+        # Retry until attempts are used up, then send to DLQ
+        # (split first - requeueing bumps the attempt count)
+        max_attempts = self.config.MAX_RETRIES
+        retries = [m for m in rejects if m.attempt < max_attempts]
+        exhausted = [m for m in rejects if m.attempt >= max_attempts]
+        
+        # Each call is applied whole or not at all, so clear each group as
+        # it lands and put back only what Redis never saw
+        try:
+            self.queue.acknowledge_batch(acks)
+            acks = []
+            self.queue.reject_batch(retries)
+            retries = []
+            self.queue.reject_batch(exhausted, requeue=False, send_to_dlq=True)
+            exhausted = []
+        except Exception as e:
+            logger.exception("Error flushing acknowledgements, will retry: %s", e)
+            self._restore_pending(acks, retries + exhausted)
+    
+    def _restore_pending(self, acks: List[QueueMessage], rejects: List[QueueMessage]) -> None:
+        """Put messages from a failed flush back in front of the buffers for the next one."""
+        with self._ack_lock:
+            self._pending_acks[:0] = acks
+            self._pending_rejects[:0] = rejects
+            self._ack_deadline = time.monotonic() + self.config.QUEUE_BATCH_MAX_DELAY_MS / 1000
+    
+    def _process_one(self, message: QueueMessage) -> bool:
+        """
+        Process a single message from the queue.
+        
+        The caller acknowledges or rejects the message based on the result.
+        
+        Returns True if the message should be acknowledged, False if it
+        should be rejected.
+        """
+        self._in_flight[message.id] = message
         
         try:
             logger.info(
-                f"Processing message {message.id} "
-                f"(execution: {message.execution_id}, attempt: {message.attempt})"
+                "Processing message %s (execution: %s, attempt: %d)",
+                message.id, message.execution_id, message.attempt,
             )
             
             # Execute the workflow
-            execution_id = UUID(message.execution_id)
-            result = self.orchestrator.execute(execution_id)
+            execution_id = message.execution_id
+            result = self.orchestrator.execute(
+                execution_id,
+                resume_state=message.payload.get("resume_state"),
+            )
             
-            # Success - acknowledge the message
-            self.queue.acknowledge(message)
-            logger.info(f"Message {message.id} completed: {result.get('status')}")
+            # Deferred step - schedule the remainder instead of sleeping on it
+            if result.get("status") == "deferred":
+                self.queue.enqueue(
+                    execution_id,
+                    task_type=message.task_type,
+                    payload={"resume_state": result["resume_state"]},
+                    delay_seconds=result["delay_seconds"],
+                )
             
-            return True
+            logger.info("Message %s completed: %s", message.id, result.get("status"))
             
+            return True
+        
         except Exception as e:
-            logger.exception(f"Failed to process message {message.id}: {e}")
-            
-            # Determine whether to retry or send to DLQ
-            max_attempts = self.config.MAX_RETRIES
-            send_to_dlq = message.attempt >= max_attempts
-            
-            self.queue.reject(
-                message,
-                requeue=not send_to_dlq,
-                send_to_dlq=send_to_dlq,
-            )
+            # Only a final failure needs the traceback; retries are expected
+            if message.attempt >= self.config.MAX_RETRIES:
+                logger.exception("Failed to process message %s: %s", message.id, e)
+            else:
+                logger.warning(
+                    "Rejecting message %s (attempt %d), will retry: %s",
+                    message.id, message.attempt, e,
+                )
             
             return False
         
         finally:
-            self._current_message = None
+            self._in_flight.pop(message.id, None)
     
-    def _recovery_loop(self) -> None:
+    def _maybe_recover(self) -> None:
         """
-        Background loop to recover stale messages.
+        Recover stale messages if RECOVERY_INTERVAL has passed.
         
-        Runs periodically to find messages that were being processed
-        but never acknowledged (e.g., due to worker crash).
+        Finds messages that were being processed but never acknowledged
+        (e.g., due to worker crash), and refreshes the cached health status
+        and queue lengths while it's at it.
         """
-        recovery_interval = 60  # seconds
+        now = time.monotonic()
+        if now - self._last_recovery < self.RECOVERY_INTERVAL:
+            return
+        self._last_recovery = now
         
-        while not self._shutdown_event.wait(recovery_interval):
-            try:
-                recovered = self.queue.recover_stale_messages()
-                if recovered > 0:
-                    logger.info(f"Recovered {recovered} stale messages")
-            except Exception as e:
-                logger.error(f"Error in recovery loop: {e}")
+        try:
+            recovered = self.queue.recover_stale_messages()
+            if recovered > 0:
+                logger.info("Recovered %d stale messages", recovered)
+        except Exception as e:
+            logger.error("Error recovering stale messages: %s", e)
+        
+        self._refresh_health()
+        self._refresh_queue_lengths()
     
     @property
     def is_healthy(self) -> bool:
-        """Check if the worker is healthy."""
+        """
+        Check if the worker is healthy.
+        
+        Probe results are reused for HEALTH_CACHE_TTL seconds, so frequent
+        health scrapes don't each cost a database and Redis round trip.
+        """
+        with self._health_lock:
+            cached = self._health_cache
+        
+        if cached is None or time.monotonic() - cached[0] >= self.HEALTH_CACHE_TTL:
+            cached = self._refresh_health()
+        
+        _, db_healthy, queue_healthy = cached
+        return db_healthy and queue_healthy
+    
+    def _refresh_health(self) -> Tuple[float, bool, bool]:
+        """Probe the database and queue and cache the result."""
         try:
             db_healthy = self.db.health_check()
             queue_healthy = self.queue.health_check()
-            return db_healthy and queue_healthy
         except Exception:
-            return False
+            db_healthy = queue_healthy = False
+        
+        result = (time.monotonic(), db_healthy, queue_healthy)
+        with self._health_lock:
+            self._health_cache = result
+        return result
+    
+    def _refresh_queue_lengths(self) -> Dict[str, int]:
+        """Fetch queue-wide lengths from Redis and cache them for get_stats."""
+        try:
+            self._queue_lengths = self.queue.get_lengths()
+        except Exception as e:
+            logger.error("Error fetching queue lengths: %s", e)
+        return self._queue_lengths or {}
     
     def get_stats(self) -> dict:
-        """Get worker statistics."""
+        """
+        Get worker statistics.
+        
+        Counters are this worker's own; queue lengths are shared across
+        workers and may be up to RECOVERY_INTERVAL seconds old.
+        
+        current_messages lists every message being processed, one per busy
+        handler thread. current_message (the first of them, or None) is
+        kept for callers from before the worker ran several threads.
+        """
+        queue_lengths = self._queue_lengths or self._refresh_queue_lengths()
+        current_messages = list(self._in_flight)
         return {
             "running": self._running,
-            "queue_length": self.queue.get_queue_length(),
-            "processing_length": self.queue.get_processing_length(),
-            "dlq_length": self.queue.get_dlq_length(),
-            "current_message": self._current_message.id if self._current_message else None,
+            **queue_lengths,
+            "processed": self._processed,
+            "failed": self._failed,
+            "in_flight": len(current_messages),
+            "prefetched": self._local_queue.qsize(),
+            "current_message": current_messages[0] if current_messages else None,
+            "current_messages": current_messages,
         }
 
 
+def _configure_logging() -> None:
+    """
+    Set up root logging from LOG_LEVEL and LOG_FORMAT.
+    
+    Timestamps use a fixed ISO format rather than the default, which also
+    appends milliseconds, and per-record process lookups are skipped
+    unless the format uses them. Does nothing if the root logger already
+    has handlers, so calling it twice doesn't duplicate every line.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    
+    config = get_config()
+    log_format = config.LOG_FORMAT
+    
+    logging.logProcesses = "%(process)" in log_format
+    logging.logMultiprocessing = "%(processName)" in log_format
+    
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(log_format, datefmt="%Y-%m-%dT%H:%M:%S"))
+    
+    root.addHandler(handler)
+    root.setLevel(config.LOG_LEVEL.upper())
+
+
 def run_worker() -> None:
     """Entry point for running the worker."""
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    )
+    _configure_logging()
     
     worker = Worker()
     worker.start()
@@ -0,0 +1,118 @@
+"""
+Integration tests for the per-worker test database setup.
+
+Need a reachable Postgres (docker compose up postgres); skipped otherwise.
+"""
+
+import pytest
+
+from tests.conftest import TEST_DATABASE_URL, _ensure_database, _schema_checksum
+
+SCRATCH_URL = f"{TEST_DATABASE_URL}_setup"
+SERVER_URL, SCRATCH_NAME = SCRATCH_URL.rsplit("/", 1)
+
+
+@pytest.fixture(scope="session")
+def admin():
+    """
+    Autocommit connection to the server's postgres database.
+    
+    Session-scoped so it resolves (and skips) before test_database does.
+    """
+    psycopg2 = pytest.importorskip("psycopg2")
+    try:
+        conn = psycopg2.connect(f"{SERVER_URL}/postgres", connect_timeout=2)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres not available: {e}")
+    conn.autocommit = True
+    
+    yield conn
+    
+    conn.close()
+
+
+@pytest.fixture
+def scratch(admin):
+    """Drops the scratch database after the test."""
+    yield
+    
+    with admin.cursor() as cur:
+        cur.execute(f'DROP DATABASE IF EXISTS "{SCRATCH_NAME}" WITH (FORCE)')
+
+
+def _stamp(admin):
+    with admin.cursor() as cur:
+        cur.execute(
+            "SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname = %s",
+            (SCRATCH_NAME,),
+        )
+        row = cur.fetchone()
+    return row and row[0]
+
+
+def _count_workflows():
+    import psycopg2
+    
+    conn = psycopg2.connect(SCRATCH_URL)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM workflows")
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _insert_workflow():
+    import psycopg2
+    
+    conn = psycopg2.connect(SCRATCH_URL)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("INSERT INTO workflows (name) VALUES ('kept')")
+    finally:
+        conn.close()
+
+
+@pytest.mark.integration
+class TestEnsureDatabase:
+    """Tests for _ensure_database."""
+    
+    def test_creates_and_stamps(self, admin, scratch):
+        """Test a missing database is created, migrated and stamped with the checksum."""
+        _ensure_database(SCRATCH_URL)
+        
+        assert _stamp(admin) == _schema_checksum()
+        assert _count_workflows() == 0
+    
+    def test_up_to_date_database_kept(self, admin, scratch):
+        """Test a database stamped with the current checksum is left alone."""
+        _ensure_database(SCRATCH_URL)
+        _insert_workflow()
+        
+        _ensure_database(SCRATCH_URL)
+        
+        assert _count_workflows() == 1
+    
+    def test_stale_database_rebuilt(self, admin, scratch):
+        """Test a stale stamp rebuilds the database, even with a connection open."""
+        import psycopg2
+        
+        _ensure_database(SCRATCH_URL)
+        _insert_workflow()
+        with admin.cursor() as cur:
+            cur.execute(f"COMMENT ON DATABASE \"{SCRATCH_NAME}\" IS 'stale'")
+        held = psycopg2.connect(SCRATCH_URL)
+        
+        try:
+            _ensure_database(SCRATCH_URL)
+        finally:
+            held.close()
+        
+        assert _stamp(admin) == _schema_checksum()
+        assert _count_workflows() == 0
+    
+    def test_session_database_ready(self, admin, clean_database):
+        """Test the session fixture's database, with or without xdist, has the schema."""
+        with clean_database.get_cursor() as cur:
+            cur.execute("SELECT count(*) FROM workflows")
+            assert cur.fetchone()["count"] == 0
@@ -1 +0,0 @@
-# Unit tests package
@@ -0,0 +1,125 @@
+"""
+Fixtures for unit tests.
+
+Two autouse fixtures make entities deterministic in every test:
+frozen_time pins datetime.utcnow() as seen by src.domain.entities, and
+_fast_uuid swaps its uuid4() for a per-test counter.
+
+Handlers keep no per-call state, so each one is built once per session.
+id_pool is a seeded pool of UUIDs for tests that need many distinct
+ids, and queue is a TaskQueue over an in-process fake Redis.
+"""
+
+import itertools
+import random
+from datetime import datetime
+from uuid import UUID
+
+import pytest
+
+from src.services.task_handlers import (
+    HttpRequestHandler,
+    DataTransformHandler,
+    DelayHandler,
+    ConditionalHandler,
+    LogHandler,
+    create_default_registry,
+)
+
+FROZEN_NOW = datetime(2024, 1, 1)
+
+
+class _FrozenDatetime(datetime):
+    """datetime whose utcnow() always returns FROZEN_NOW."""
+    
+    @classmethod
+    def utcnow(cls):
+        return FROZEN_NOW
+
+
+@pytest.fixture(autouse=True)
+def frozen_time(monkeypatch):
+    """
+    Freeze the clock the entities read in create()/start()/complete()/fail().
+    
+    Dataclass default_factory=datetime.utcnow was bound at import, so
+    only timestamps set inside method bodies see the frozen value.
+    """
+    monkeypatch.setattr("src.domain.entities.datetime", _FrozenDatetime)
+    return FROZEN_NOW
+
+
+@pytest.fixture(autouse=True)
+def _fast_uuid(monkeypatch):
+    """
+    Give entities counter-based ids instead of calling uuid4().
+    
+    Ids are unique within a test and the same on every run, which keeps
+    failures reproducible.
+    """
+    counter = itertools.count(1)
+    monkeypatch.setattr(
+        "src.domain.entities.uuid4", lambda: UUID(int=next(counter), version=4)
+    )
+
+
+@pytest.fixture(scope="module")
+def id_pool():
+    """
+    Deterministic UUIDs for tests that just need distinct ids.
+    
+    Seeded so failures reproduce with the same ids; index into the list
+    rather than calling uuid4() in each test.
+    """
+    rng = random.Random(1234)
+    return [UUID(int=rng.getrandbits(128), version=4) for _ in range(64)]
+
+
+@pytest.fixture(scope="session")
+def default_registry():
+    """Registry with all built-in handlers."""
+    return create_default_registry()
+
+
+@pytest.fixture(scope="session")
+def log_handler():
+    """Shared LogHandler."""
+    return LogHandler()
+
+
+@pytest.fixture(scope="session")
+def delay_handler():
+    """Shared DelayHandler that always sleeps inline."""
+    return DelayHandler()
+
+
+@pytest.fixture(scope="session")
+def conditional_handler():
+    """Shared ConditionalHandler."""
+    return ConditionalHandler()
+
+
+@pytest.fixture(scope="session")
+def data_transform_handler():
+    """Shared DataTransformHandler."""
+    return DataTransformHandler()
+
+
+@pytest.fixture(scope="session")
+def http_handler():
+    """Shared HttpRequestHandler; tests patch requests.request, not the handler."""
+    return HttpRequestHandler()
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """A task queue whose connections all share one in-process fake Redis."""
+    import fakeredis
+    from src.worker.queue import TaskQueue
+    
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        "src.worker.queue.redis.from_url",
+        lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs),
+    )
+    return TaskQueue(redis_url="redis://fake", queue_name="test")
@@ -4,7 +4,7 @@ Unit tests for domain entities.
 
 import pytest
 from datetime import datetime
-from uuid import uuid4
+from uuid import UUID
 
 from src.domain.entities import (
     Workflow, WorkflowStep, WorkflowExecution, StepExecution, ExecutionLog
@@ -14,28 +14,156 @@ from src.domain.enums import (
 )
 
 
+# Fixed ids for factory parameters, which are built at collection time;
+# kept apart from the small counter ids _fast_uuid hands out
+WORKFLOW_ID = UUID("a0000000-0000-4000-8000-000000000001")
+EXECUTION_ID = UUID("a0000000-0000-4000-8000-000000000002")
+STEP_ID = UUID("a0000000-0000-4000-8000-000000000003")
+
+
+@pytest.fixture
+def workflow_factory():
+    """Callable building DRAFT workflows; name defaults to "test"."""
+    def _make(**kwargs):
+        kwargs.setdefault("name", "test")
+        return Workflow.create(**kwargs)
+    return _make
+
+
+@pytest.fixture
+def fresh_workflow(workflow_factory):
+    """A DRAFT workflow with no steps."""
+    return workflow_factory()
+
+
+@pytest.fixture
+def draft_workflow_with_step(fresh_workflow):
+    """A DRAFT workflow with a single log step."""
+    workflow = fresh_workflow
+    workflow.add_step(WorkflowStep.create(
+        workflow_id=workflow.id,
+        name="step1",
+        task_type="log",
+        step_order=0,
+    ))
+    return workflow
+
+
+@pytest.fixture
+def activated_workflow(draft_workflow_with_step):
+    """The single-step workflow, activated."""
+    draft_workflow_with_step.activate()
+    return draft_workflow_with_step
+
+
+class TestEntityFactories:
+    """Tests for the entity create() factory methods."""
+    
+    @pytest.mark.parametrize(
+        "factory,kwargs,expected",
+        [
+            (
+                Workflow.create,
+                {
+                    "name": "test-workflow",
+                    "description": "Test description",
+                    "metadata": {"owner": "test"},
+                },
+                {
+                    "name": "test-workflow",
+                    "description": "Test description",
+                    "status": WorkflowStatus.DRAFT,
+                    "version": 1,
+                    "metadata": {"owner": "test"},
+                    "steps": [],
+                },
+            ),
+            (
+                WorkflowStep.create,
+                {
+                    "workflow_id": WORKFLOW_ID,
+                    "name": "test-step",
+                    "task_type": "http_request",
+                    "step_order": 0,
+                    "config": {"url": "http://example.com"},
+                    "timeout_seconds": 120,
+                    "max_retries": 5,
+                },
+                {
+                    "workflow_id": WORKFLOW_ID,
+                    "name": "test-step",
+                    "task_type": "http_request",
+                    "step_order": 0,
+                    "config": {"url": "http://example.com"},
+                    "timeout_seconds": 120,
+                    "max_retries": 5,
+                },
+            ),
+            (
+                WorkflowExecution.create,
+                {
+                    "workflow_id": WORKFLOW_ID,
+                    "idempotency_key": "test-key-123",
+                    "input_data": {"key": "value"},
+                    "max_retries": 5,
+                },
+                {
+                    "workflow_id": WORKFLOW_ID,
+                    "idempotency_key": "test-key-123",
+                    "status": ExecutionStatus.PENDING,
+                    "input_data": {"key": "value"},
+                    "max_retries": 5,
+                    "retry_count": 0,
+                },
+            ),
+            (
+                StepExecution.create,
+                {
+                    "execution_id": EXECUTION_ID,
+                    "step_id": STEP_ID,
+                    "step_order": 0,
+                    "input_data": {"input": "data"},
+                },
+                {
+                    "execution_id": EXECUTION_ID,
+                    "step_id": STEP_ID,
+                    "status": StepStatus.PENDING,
+                    "input_data": {"input": "data"},
+                },
+            ),
+            (
+                ExecutionLog.create,
+                {
+                    "execution_id": EXECUTION_ID,
+                    "level": LogLevel.INFO,
+                    "message": "Test message",
+                    "details": {"key": "value"},
+                },
+                {
+                    "execution_id": EXECUTION_ID,
+                    "level": LogLevel.INFO,
+                    "message": "Test message",
+                    "details": {"key": "value"},
+                },
+            ),
+        ],
+        ids=["workflow", "step", "execution", "step_exec", "log"],
+    )
+    def test_factory_defaults(self, factory, kwargs, expected):
+        """Test each factory assigns an id and the given and default fields."""
+        obj = factory(**kwargs)
+        
+        assert obj.id is not None
+        for key, value in expected.items():
+            assert getattr(obj, key) == value
+
+
 class TestWorkflow:
     """Tests for Workflow entity."""
     
-    def test_create_workflow(self):
-        """Test workflow factory method."""
-        workflow = Workflow.create(
-            name="test-workflow",
-            description="Test description",
-            metadata={"owner": "test"},
-        )
-        
-        assert workflow.id is not None
-        assert workflow.name == "test-workflow"
-        assert workflow.description == "Test description"
-        assert workflow.status == WorkflowStatus.DRAFT
-        assert workflow.version == 1
-        assert workflow.metadata == {"owner": "test"}
-        assert workflow.steps == []
-    
-    def test_add_step(self):
+    def test_add_step(self, fresh_workflow):
         """Test adding steps to workflow."""
-        workflow = Workflow.create(name="test")
+        workflow = fresh_workflow
         
         step1 = WorkflowStep.create(
             workflow_id=workflow.id,
@@ -59,274 +187,152 @@ class TestWorkflow:
         assert workflow.steps[0].name == "step1"
         assert workflow.steps[1].name == "step2"
     
-    def test_activate_workflow_without_steps(self):
+    def test_activate_workflow_without_steps(self, fresh_workflow):
         """Test that workflow cannot be activated without steps."""
-        workflow = Workflow.create(name="test")
-        
         with pytest.raises(ValueError, match="without steps"):
-            workflow.activate()
+            fresh_workflow.activate()
     
-    def test_activate_workflow_with_steps(self):
+    def test_activate_workflow_with_steps(self, draft_workflow_with_step):
         """Test successful workflow activation."""
-        workflow = Workflow.create(name="test")
-        step = WorkflowStep.create(
-            workflow_id=workflow.id,
-            name="step1",
-            task_type="log",
-            step_order=0,
-        )
-        workflow.add_step(step)
+        draft_workflow_with_step.activate()
         
-        workflow.activate()
-        
-        assert workflow.status == WorkflowStatus.ACTIVE
+        assert draft_workflow_with_step.status == WorkflowStatus.ACTIVE
     
-    def test_activate_non_draft_workflow(self):
+    def test_activate_non_draft_workflow(self, activated_workflow):
         """Test that only DRAFT workflows can be activated."""
-        workflow = Workflow.create(name="test")
-        step = WorkflowStep.create(
-            workflow_id=workflow.id,
-            name="step1",
-            task_type="log",
-            step_order=0,
-        )
-        workflow.add_step(step)
-        workflow.activate()
-        
         with pytest.raises(ValueError, match="Cannot activate"):
-            workflow.activate()
+            activated_workflow.activate()
     
-    def test_deprecate_workflow(self):
+    def test_deprecate_workflow(self, activated_workflow):
         """Test workflow deprecation."""
-        workflow = Workflow.create(name="test")
-        step = WorkflowStep.create(
-            workflow_id=workflow.id,
-            name="step1",
-            task_type="log",
-            step_order=0,
-        )
-        workflow.add_step(step)
-        workflow.activate()
-        
-        workflow.deprecate()
+        activated_workflow.deprecate()
         
-        assert workflow.status == WorkflowStatus.DEPRECATED
+        assert activated_workflow.status == WorkflowStatus.DEPRECATED
     
-    def test_archive_workflow(self):
+    def test_archive_workflow(self, fresh_workflow):
         """Test workflow archiving."""
-        workflow = Workflow.create(name="test")
-        
-        workflow.archive()
-        
-        assert workflow.status == WorkflowStatus.ARCHIVED
-
-
-class TestWorkflowStep:
-    """Tests for WorkflowStep entity."""
-    
-    def test_create_step(self):
-        """Test step factory method."""
-        workflow_id = uuid4()
-        step = WorkflowStep.create(
-            workflow_id=workflow_id,
-            name="test-step",
-            task_type="http_request",
-            step_order=0,
-            config={"url": "http://example.com"},
-            timeout_seconds=120,
-            max_retries=5,
-        )
+        fresh_workflow.archive()
         
-        assert step.id is not None
-        assert step.workflow_id == workflow_id
-        assert step.name == "test-step"
-        assert step.task_type == "http_request"
-        assert step.step_order == 0
-        assert step.config == {"url": "http://example.com"}
-        assert step.timeout_seconds == 120
-        assert step.max_retries == 5
+        assert fresh_workflow.status == WorkflowStatus.ARCHIVED
 
 
 class TestWorkflowExecution:
     """Tests for WorkflowExecution entity."""
     
-    def test_create_execution(self):
-        """Test execution factory method."""
-        workflow_id = uuid4()
-        execution = WorkflowExecution.create(
-            workflow_id=workflow_id,
-            idempotency_key="test-key-123",
-            input_data={"key": "value"},
-            max_retries=5,
-        )
-        
-        assert execution.id is not None
-        assert execution.workflow_id == workflow_id
-        assert execution.idempotency_key == "test-key-123"
-        assert execution.status == ExecutionStatus.PENDING
-        assert execution.input_data == {"key": "value"}
-        assert execution.max_retries == 5
-        assert execution.retry_count == 0
-    
-    def test_is_terminal_property(self):
-        """Test is_terminal property for different states."""
-        execution = WorkflowExecution.create(
-            workflow_id=uuid4(),
+    @pytest.fixture
+    def execution(self, id_pool):
+        """A fresh PENDING execution."""
+        return WorkflowExecution.create(
+            workflow_id=id_pool[0],
             idempotency_key="test",
         )
-        
-        # PENDING is not terminal
-        assert not execution.is_terminal
-        
-        # COMPLETED is terminal
-        execution.status = ExecutionStatus.COMPLETED
-        assert execution.is_terminal
-        
-        # FAILED is terminal
-        execution.status = ExecutionStatus.FAILED
-        assert execution.is_terminal
-        
-        # CANCELLED is terminal
-        execution.status = ExecutionStatus.CANCELLED
-        assert execution.is_terminal
-        
-        # RUNNING is not terminal
-        execution.status = ExecutionStatus.RUNNING
-        assert not execution.is_terminal
     
-    def test_can_retry_property(self):
-        """Test can_retry property."""
-        execution = WorkflowExecution.create(
-            workflow_id=uuid4(),
-            idempotency_key="test",
-            max_retries=3,
-        )
-        
-        # PENDING cannot retry
-        assert not execution.can_retry
-        
-        # FAILED with retries left can retry
-        execution.status = ExecutionStatus.FAILED
-        execution.retry_count = 0
-        assert execution.can_retry
-        
-        # FAILED at max retries cannot retry
-        execution.retry_count = 3
-        assert not execution.can_retry
+    @pytest.mark.parametrize(
+        "status,expected",
+        [
+            (ExecutionStatus.PENDING, False),
+            (ExecutionStatus.RUNNING, False),
+            (ExecutionStatus.COMPLETED, True),
+            (ExecutionStatus.FAILED, True),
+            (ExecutionStatus.CANCELLED, True),
+            (ExecutionStatus.RETRYING, False),
+        ],
+        ids=["pending", "running", "completed", "failed", "cancelled", "retrying"],
+    )
+    def test_is_terminal_property(self, execution, status, expected):
+        """Test is_terminal property for each state."""
+        execution.status = status
+        
+        assert execution.is_terminal is expected
+    
+    @pytest.mark.parametrize(
+        "status,retry_count,max_retries,expected",
+        [
+            (ExecutionStatus.PENDING, 0, 3, False),
+            (ExecutionStatus.RUNNING, 0, 3, False),
+            (ExecutionStatus.FAILED, 0, 3, True),
+            (ExecutionStatus.FAILED, 2, 3, True),
+            (ExecutionStatus.FAILED, 3, 3, False),
+            (ExecutionStatus.COMPLETED, 0, 3, False),
+        ],
+        ids=["pending", "running", "failed", "last-retry", "exhausted", "completed"],
+    )
+    def test_can_retry_property(self, execution, status, retry_count, max_retries, expected):
+        """Test can_retry only allows FAILED executions with retries left."""
+        execution.status = status
+        execution.retry_count = retry_count
+        execution.max_retries = max_retries
+        
+        assert execution.can_retry is expected
 
 
 class TestStepExecution:
     """Tests for StepExecution entity."""
     
-    def test_create_step_execution(self):
-        """Test step execution factory method."""
-        execution_id = uuid4()
-        step_id = uuid4()
-        
-        step_exec = StepExecution.create(
-            execution_id=execution_id,
-            step_id=step_id,
-            step_order=0,
-            input_data={"input": "data"},
-        )
-        
-        assert step_exec.id is not None
-        assert step_exec.execution_id == execution_id
-        assert step_exec.step_id == step_id
-        assert step_exec.status == StepStatus.PENDING
-        assert step_exec.input_data == {"input": "data"}
-    
-    def test_start_step(self):
-        """Test starting a step execution."""
-        step_exec = StepExecution.create(
-            execution_id=uuid4(),
-            step_id=uuid4(),
-            step_order=0,
-        )
-        
-        step_exec.start()
-        
-        assert step_exec.status == StepStatus.RUNNING
-        assert step_exec.started_at is not None
-    
-    def test_complete_step(self):
-        """Test completing a step execution."""
+    @pytest.mark.parametrize(
+        "action,args,needs_start,status,attrs,stamp",
+        [
+            ("start", (), False, StepStatus.RUNNING, {}, "started_at"),
+            (
+                "complete",
+                ({"result": "success"},),
+                True,
+                StepStatus.COMPLETED,
+                {"output_data": {"result": "success"}},
+                "completed_at",
+            ),
+            (
+                "fail",
+                ("Something went wrong", {"traceback": "..."}),
+                True,
+                StepStatus.FAILED,
+                {"error_message": "Something went wrong", "error_details": {"traceback": "..."}},
+                None,
+            ),
+        ],
+        ids=["start", "complete", "fail"],
+    )
+    def test_lifecycle(
+        self, id_pool, frozen_time, action, args, needs_start, status, attrs, stamp
+    ):
+        """Test each lifecycle method sets the status, its fields and timestamp."""
         step_exec = StepExecution.create(
-            execution_id=uuid4(),
-            step_id=uuid4(),
+            execution_id=id_pool[0],
+            step_id=id_pool[1],
             step_order=0,
         )
+        if needs_start:
+            step_exec.start()
         
-        step_exec.start()
-        step_exec.complete(output_data={"result": "success"})
+        getattr(step_exec, action)(*args)
         
-        assert step_exec.status == StepStatus.COMPLETED
-        assert step_exec.output_data == {"result": "success"}
-        assert step_exec.completed_at is not None
-    
-    def test_fail_step(self):
-        """Test failing a step execution."""
-        step_exec = StepExecution.create(
-            execution_id=uuid4(),
-            step_id=uuid4(),
-            step_order=0,
-        )
-        
-        step_exec.start()
-        step_exec.fail("Something went wrong", {"traceback": "..."})
-        
-        assert step_exec.status == StepStatus.FAILED
-        assert step_exec.error_message == "Something went wrong"
-        assert step_exec.error_details == {"traceback": "..."}
+        assert step_exec.status == status
+        for key, value in attrs.items():
+            assert getattr(step_exec, key) == value
+        if stamp is not None:
+            assert getattr(step_exec, stamp) == frozen_time
 
 
 class TestExecutionLog:
     """Tests for ExecutionLog entity."""
     
-    def test_create_log(self):
-        """Test log factory method."""
-        execution_id = uuid4()
-        
-        log = ExecutionLog.create(
-            execution_id=execution_id,
-            level=LogLevel.INFO,
-            message="Test message",
-            details={"key": "value"},
-        )
-        
-        assert log.id is not None
-        assert log.execution_id == execution_id
-        assert log.level == LogLevel.INFO
-        assert log.message == "Test message"
-        assert log.details == {"key": "value"}
-    
-    def test_info_helper(self):
-        """Test info helper method."""
-        execution_id = uuid4()
-        
-        log = ExecutionLog.info(
-            execution_id,
-            "Info message",
-            extra_key="extra_value",
-        )
-        
-        assert log.level == LogLevel.INFO
-        assert log.message == "Info message"
-        assert log.details["extra_key"] == "extra_value"
-    
-    def test_error_helper(self):
-        """Test error helper method."""
-        execution_id = uuid4()
-        step_exec_id = uuid4()
-        
-        log = ExecutionLog.error(
-            execution_id,
-            "Error message",
-            step_execution_id=step_exec_id,
-            error_code="ERR001",
-        )
-        
-        assert log.level == LogLevel.ERROR
-        assert log.message == "Error message"
-        assert log.step_execution_id == step_exec_id
-        assert log.details["error_code"] == "ERR001"
+    @pytest.mark.parametrize(
+        "helper,level,extras",
+        [
+            ("info", LogLevel.INFO, {"extra_key": "extra_value"}),
+            ("error", LogLevel.ERROR, {"error_code": "ERR001", "step_execution_id": STEP_ID}),
+        ],
+        ids=["info", "error"],
+    )
+    def test_level_helper(self, id_pool, helper, level, extras):
+        """Test the level helpers set the level and route extras into details."""
+        log = getattr(ExecutionLog, helper)(id_pool[0], "Helper message", **extras)
+        
+        assert log.level == level
+        assert log.message == "Helper message"
+        for key, value in extras.items():
+            if key == "step_execution_id":
+                assert log.step_execution_id == value
+                assert key not in log.details
+            else:
+                assert log.details[key] == value
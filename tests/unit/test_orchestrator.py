@@ -0,0 +1,164 @@
+"""
+Unit tests for the workflow orchestrator.
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from src.domain import ExecutionStatus, WorkflowStatus
+from src.domain.entities import Workflow, WorkflowExecution, WorkflowStep
+from src.services.orchestrator import WorkflowOrchestrator
+from src.services.task_handlers import DelayHandler, TaskHandler, TaskHandlerRegistry
+
+
+class _RecordingHandler(TaskHandler):
+    """Returns its step's config as output and records the input it saw."""
+    
+    def __init__(self):
+        self.inputs = []
+    
+    @property
+    def task_type(self) -> str:
+        return "record"
+    
+    def execute(self, step_config, input_data, timeout=300):
+        self.inputs.append(dict(input_data))
+        return dict(step_config)
+
+
+@pytest.fixture
+def recorder():
+    """A fresh recording handler, so recorded inputs don't leak between tests."""
+    return _RecordingHandler()
+
+
+@pytest.fixture
+def orchestrator(recorder):
+    """An orchestrator over mock repositories, with delays over a second deferred."""
+    registry = TaskHandlerRegistry()
+    registry.register(recorder)
+    registry.register(DelayHandler(max_inline_seconds=1))
+    orchestrator = WorkflowOrchestrator(
+        workflow_repo=MagicMock(),
+        execution_repo=MagicMock(),
+        log_repo=MagicMock(),
+        task_registry=registry,
+    )
+    orchestrator.execution_service = MagicMock()
+    return orchestrator
+
+
+@pytest.fixture
+def workflow():
+    """An active workflow: record, a long delay, then record again."""
+    workflow = Workflow.create(name="deferring")
+    for order, (name, task_type, config) in enumerate([
+        ("before", "record", {"before": True}),
+        ("wait", "delay", {"seconds": 60}),
+        ("after", "record", {"after": True}),
+    ]):
+        workflow.add_step(WorkflowStep.create(workflow.id, name, task_type, order, config))
+    workflow.status = WorkflowStatus.ACTIVE
+    return workflow
+
+
+class TestDeferredSteps:
+    """Tests for steps that defer instead of blocking."""
+    
+    def test_defer_and_resume(self, orchestrator, recorder, workflow):
+        """Test a deferred step returns resume state, and resuming picks up at the next step."""
+        execution = WorkflowExecution.create(workflow.id, "key", input_data={"x": 1})
+        orchestrator.workflow_repo.get_workflow_by_id.return_value = workflow
+        orchestrator.execution_service.get_execution.return_value = execution
+        orchestrator.execution_service.start_execution.return_value = execution
+        
+        result = orchestrator.execute(execution.id)
+        
+        assert result == {
+            "status": "deferred",
+            "execution_id": str(execution.id),
+            "delay_seconds": 60,
+            "resume_state": {
+                "steps": {"before": {"before": True}, "wait": {"delayed_seconds": 60}},
+                "data": {"x": 1, "before": True, "delayed_seconds": 60},
+            },
+        }
+        orchestrator.execution_repo.update_execution_status.assert_called_with(
+            execution.id, ExecutionStatus.RUNNING, current_step_order=2,
+        )
+        
+        execution.status = ExecutionStatus.RUNNING
+        execution.current_step_order = 2
+        result = orchestrator.execute(execution.id, resume_state=result["resume_state"])
+        
+        assert result["status"] == "completed"
+        assert list(result["output"]["steps"]) == ["before", "wait", "after"]
+        assert recorder.inputs == [
+            {"x": 1},
+            {"x": 1, "before": True, "delayed_seconds": 60},
+        ]
+        orchestrator.execution_service.complete_execution.assert_called_once()
+
+
+class TestWorkflowCache:
+    """Tests for the workflow definition cache."""
+    
+    def test_draft_not_cached(self, orchestrator, workflow):
+        """Test drafts are re-read every time, since their steps can still change."""
+        workflow.status = WorkflowStatus.DRAFT
+        orchestrator.workflow_repo.get_workflow_by_id.return_value = workflow
+        
+        orchestrator._get_workflow(workflow.id)
+        orchestrator._get_workflow(workflow.id)
+        
+        assert orchestrator.workflow_repo.get_workflow_by_id.call_count == 2
+        assert workflow.id not in orchestrator._workflows
+    
+    def test_active_workflow_cached(self, orchestrator, workflow):
+        """Test a workflow past DRAFT is read once and then served from the cache."""
+        orchestrator.workflow_repo.get_workflow_by_id.return_value = workflow
+        
+        assert orchestrator._get_workflow(workflow.id) is workflow
+        assert orchestrator._get_workflow(workflow.id) is workflow
+        
+        orchestrator.workflow_repo.get_workflow_by_id.assert_called_once_with(workflow.id)
+    
+    def test_least_recently_used_evicted(self, orchestrator, workflow, monkeypatch):
+        """Test the cache drops the least recently used workflow once full."""
+        monkeypatch.setattr(WorkflowOrchestrator, "WORKFLOW_CACHE_SIZE", 2)
+        orchestrator.workflow_repo.get_workflow_by_id.side_effect = lambda workflow_id: workflow
+        
+        for workflow_id in ("a", "b", "a", "c"):
+            orchestrator._get_workflow(workflow_id)
+        
+        assert list(orchestrator._workflows) == ["a", "c"]
+
+
+class TestPreparedSteps:
+    """Tests for the prepared step cache."""
+    
+    def test_prepared_once_and_bounded(self, orchestrator, recorder, workflow, monkeypatch):
+        """Test a step is prepared once, and the least recently used is evicted once full."""
+        monkeypatch.setattr(WorkflowOrchestrator, "PREPARED_STEP_CACHE_SIZE", 2)
+        first, _, last = workflow.steps
+        
+        run_step = orchestrator._get_prepared_step(first, recorder)
+        
+        assert orchestrator._get_prepared_step(first, recorder) is run_step
+        orchestrator._get_prepared_step(workflow.steps[1], recorder)
+        orchestrator._get_prepared_step(first, recorder)
+        orchestrator._get_prepared_step(last, recorder)
+        assert list(orchestrator._prepared_steps) == [first.id, last.id]
+    
+    def test_evicted_with_workflow(self, orchestrator, recorder, workflow, monkeypatch):
+        """Test evicting a workflow from its cache drops its prepared steps too."""
+        monkeypatch.setattr(WorkflowOrchestrator, "WORKFLOW_CACHE_SIZE", 1)
+        other = Workflow.create(name="other")
+        other.status = WorkflowStatus.ACTIVE
+        orchestrator.workflow_repo.get_workflow_by_id.side_effect = [workflow, other]
+        orchestrator._get_workflow(workflow.id)
+        orchestrator._get_prepared_step(workflow.steps[0], recorder)
+        
+        orchestrator._get_workflow(other.id)
+        
+        assert not orchestrator._prepared_steps
@@ -0,0 +1,194 @@
+"""
+Unit tests for the Redis task queue, against an in-process fake Redis.
+"""
+
+import threading
+import time
+from dataclasses import replace
+from uuid import UUID
+
+import pytest
+import redis
+
+from src.worker.queue import QueueMessage
+
+
+EXECUTION_ID = UUID("b0000000-0000-4000-8000-000000000002")
+
+
+class _BlockingConnection:
+    """Stand-in for the blocking connection: BLMOVE blocks until the connection is closed."""
+    
+    def __init__(self):
+        self.waiting = threading.Event()
+        self.closed = threading.Event()
+    
+    def blmove(self, *args, **kwargs):
+        self.waiting.set()
+        self.closed.wait(5)
+        raise redis.ConnectionError("Connection closed by server.")
+    
+    def close(self):
+        self.closed.set()
+
+
+class TestQueueMessage:
+    """Tests for QueueMessage serialization."""
+    
+    def test_wire_format(self):
+        """Test the exact bytes written, with execution_id as hex, and that they round-trip."""
+        message = QueueMessage("m1", EXECUTION_ID, "execute_workflow", {1: "a"}, 1700000000.5)
+        
+        raw = message.to_json()
+        
+        assert raw == (
+            b'{"id":"m1","execution_id":"b0000000000040008000000000000002",'
+            b'"task_type":"execute_workflow","payload":{"1":"a"},'
+            b'"created_at":1700000000.5,"attempt":1,"visibility_timeout":30}'
+        )
+        assert QueueMessage.from_json(raw) == replace(message, payload={"1": "a"})
+
+
+class TestDequeueBatch:
+    """Tests for batch dequeue and acknowledgement."""
+    
+    def test_poison_message_goes_to_dlq(self, queue):
+        """Test an undecodable payload is dead-lettered and the rest of the batch claimed."""
+        first = queue.enqueue(EXECUTION_ID)
+        queue.redis.lpush(queue.queue_name, "not json")
+        last = queue.enqueue(EXECUTION_ID)
+        
+        messages = queue.dequeue_batch(10, timeout=0)
+        
+        assert [m.id for m in messages] == [first.id, last.id]
+        assert queue.redis.lrange(queue.dlq_name, 0, -1) == ["not json"]
+        assert queue.redis.llen(queue.processing_queue) == 0
+        assert queue.get_processing_length() == 2
+    
+    def test_recovery_dead_letters_poison_left_on_processing_list(self, queue):
+        """Test recovery skips past an undecodable message instead of aborting."""
+        stranded = QueueMessage.create(EXECUTION_ID)
+        queue.redis.lpush(queue.processing_queue, stranded.to_json(), "not json")
+        
+        assert queue.recover_stale_messages() == 0
+        
+        assert queue.redis.lrange(queue.dlq_name, 0, -1) == ["not json"]
+        assert queue.redis.hkeys(queue.processing_hash) == [stranded.id]
+    
+    def test_batched_ack_and_reject(self, queue):
+        """Test one batch acknowledged and rejected in single calls ends up in the right places."""
+        for _ in range(3):
+            queue.enqueue(EXECUTION_ID)
+        acked, retried, dead = queue.dequeue_batch(3, timeout=0)
+        
+        queue.acknowledge_batch([acked])
+        queue.reject_batch([retried])
+        queue.reject_batch([dead], requeue=False, send_to_dlq=True)
+        
+        assert queue.get_lengths() == {"queue_length": 1, "processing_length": 0, "dlq_length": 1}
+        assert queue.redis.zcard(queue.processing_deadlines) == 0
+        [requeued] = queue.dequeue_batch(1, timeout=0)
+        assert (requeued.id, requeued.attempt) == (retried.id, 2)
+        [dead_lettered] = queue.redis.lrange(queue.dlq_name, 0, -1)
+        assert QueueMessage.from_json(dead_lettered).payload["dlq_reason"] == "rejected"
+
+
+class TestDelayedMessages:
+    """Tests for delayed message claiming."""
+    
+    def test_ready_delayed_messages_claimed_first(self, queue):
+        """Test due delayed messages come before queued ones, and future ones stay put."""
+        queued = queue.enqueue(EXECUTION_ID)
+        due = queue.enqueue(EXECUTION_ID, delay_seconds=60)
+        future = queue.enqueue(EXECUTION_ID, delay_seconds=3600)
+        queue.redis.zadd(queue.delayed_queue, {due.to_json(): 0})
+        
+        messages = queue.dequeue_batch(10, timeout=0)
+        
+        assert [m.id for m in messages] == [due.id, queued.id]
+        assert queue.redis.zrange(queue.delayed_queue, 0, -1) == [future.to_json().decode()]
+        assert queue.get_processing_length() == 2
+
+
+class TestInFlight:
+    """Tests for the in-flight hash and stale message recovery."""
+    
+    def test_acknowledge_clears_in_flight_entry(self, queue):
+        """Test acknowledging removes only that message's hash entry and deadline."""
+        for _ in range(2):
+            queue.enqueue(EXECUTION_ID)
+        done, pending = queue.dequeue_batch(2, timeout=0)
+        
+        queue.acknowledge(done)
+        
+        assert queue.redis.hkeys(queue.processing_hash) == [pending.id]
+        assert queue.redis.zrange(queue.processing_deadlines, 0, -1) == [pending.id]
+    
+    def test_extend_visibility_only_while_in_flight(self, queue):
+        """Test the deadline restarts from now, but an acknowledged message isn't brought back."""
+        queue.enqueue(EXECUTION_ID)
+        [message] = queue.dequeue_batch(1, timeout=0)
+        queue.redis.zadd(queue.processing_deadlines, {message.id: 0})
+        
+        assert queue.extend_visibility(message) is True
+        assert queue.redis.zscore(queue.processing_deadlines, message.id) > time.time()
+        
+        queue.acknowledge(message)
+        
+        assert queue.extend_visibility(message) is False
+        assert queue.redis.zcard(queue.processing_deadlines) == 0
+    
+    def test_stale_message_recovered_exactly_once(self, queue):
+        """Test an expired message is requeued once, however many sweeps run."""
+        queue.visibility_timeout = 0
+        queue.enqueue(EXECUTION_ID)
+        [stale] = queue.dequeue_batch(1, timeout=0)
+        
+        assert queue.recover_stale_messages() == 1
+        assert queue.recover_stale_messages() == 0
+        
+        assert queue.get_lengths() == {"queue_length": 1, "processing_length": 0, "dlq_length": 0}
+        [requeued] = queue.dequeue_batch(1, timeout=0)
+        assert (requeued.id, requeued.attempt) == (stale.id, 2)
+    
+    def test_stale_message_out_of_attempts_goes_to_dlq(self, queue):
+        """Test a message that keeps expiring is dead-lettered after its last attempt."""
+        stale = QueueMessage.create(EXECUTION_ID, visibility_timeout=0).with_attempt(3)
+        queue.redis.lpush(queue.queue_name, stale.to_json())
+        queue.dequeue_batch(1, timeout=0)
+        
+        assert queue.recover_stale_messages() == 1
+        
+        [dead_lettered] = queue.redis.lrange(queue.dlq_name, 0, -1)
+        assert QueueMessage.from_json(dead_lettered).payload["dlq_reason"] == "max_attempts_exceeded"
+        assert queue.get_queue_length() == 0
+
+
+class TestInterrupt:
+    """Tests for waking a blocked dequeue."""
+    
+    def test_interrupt_wakes_blocked_dequeue(self, queue):
+        """Test interrupt() from another thread makes a dequeue blocked in BLMOVE return []."""
+        connection = _BlockingConnection()
+        queue._blocking_redis = connection
+        result = []
+        thread = threading.Thread(target=lambda: result.append(queue.dequeue_batch(10, timeout=5)))
+        thread.start()
+        assert connection.waiting.wait(2)
+        
+        queue.interrupt()
+        thread.join(2)
+        
+        assert not thread.is_alive()
+        assert result == [[]]
+        assert queue._blocking_redis is None
+    
+    def test_connection_error_without_interrupt_raises(self, queue):
+        """Test a dropped blocking connection still raises when nobody interrupted it."""
+        connection = _BlockingConnection()
+        connection.close()
+        queue._blocking_redis = connection
+        
+        with pytest.raises(redis.ConnectionError):
+            queue.dequeue_batch(10, timeout=5)
+
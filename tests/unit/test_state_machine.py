@@ -2,6 +2,8 @@
 Unit tests for the state machine.
 """
 
+import functools
+
 import pytest
 
 from src.domain.enums import ExecutionStatus
@@ -10,84 +12,68 @@ from src.domain.state_machine import (
 )
 
 
+@pytest.fixture(scope="session")
+def cached_paths():
+    """get_transition_path memoized, so repeated start/end pairs skip the BFS."""
+    return functools.lru_cache(maxsize=None)(WorkflowStateMachine.get_transition_path)
+
+
+@pytest.fixture(scope="session")
+def valid_transitions_snapshot():
+    """get_valid_transitions for every state, computed once."""
+    return {
+        state: frozenset(WorkflowStateMachine.get_valid_transitions(state))
+        for state in ExecutionStatus
+    }
+
+
 class TestWorkflowStateMachine:
     """Tests for WorkflowStateMachine."""
     
-    def test_valid_transition_pending_to_running(self):
-        """Test PENDING → RUNNING transition."""
-        result = WorkflowStateMachine.transition(
-            ExecutionStatus.PENDING,
-            ExecutionStatus.RUNNING,
-        )
-        assert result == ExecutionStatus.RUNNING
-    
-    def test_valid_transition_running_to_completed(self):
-        """Test RUNNING → COMPLETED transition."""
-        result = WorkflowStateMachine.transition(
-            ExecutionStatus.RUNNING,
-            ExecutionStatus.COMPLETED,
-        )
-        assert result == ExecutionStatus.COMPLETED
-    
-    def test_valid_transition_running_to_failed(self):
-        """Test RUNNING → FAILED transition."""
-        result = WorkflowStateMachine.transition(
-            ExecutionStatus.RUNNING,
-            ExecutionStatus.FAILED,
-        )
-        assert result == ExecutionStatus.FAILED
-    
-    def test_valid_transition_failed_to_retrying(self):
-        """Test FAILED → RETRYING transition."""
-        result = WorkflowStateMachine.transition(
-            ExecutionStatus.FAILED,
-            ExecutionStatus.RETRYING,
-        )
-        assert result == ExecutionStatus.RETRYING
-    
-    def test_valid_transition_retrying_to_running(self):
-        """Test RETRYING → RUNNING transition."""
-        result = WorkflowStateMachine.transition(
-            ExecutionStatus.RETRYING,
-            ExecutionStatus.RUNNING,
-        )
-        assert result == ExecutionStatus.RUNNING
-    
-    def test_valid_transition_to_cancelled(self):
-        """Test that any non-terminal state can transition to CANCELLED."""
-        for status in [
-            ExecutionStatus.PENDING,
-            ExecutionStatus.RUNNING,
-            ExecutionStatus.FAILED,
-            ExecutionStatus.RETRYING,
-        ]:
-            assert WorkflowStateMachine.can_transition(
-                status, ExecutionStatus.CANCELLED
-            )
-    
-    def test_invalid_transition_completed_to_running(self):
-        """Test that COMPLETED is terminal and cannot transition."""
-        with pytest.raises(InvalidTransitionError):
-            WorkflowStateMachine.transition(
-                ExecutionStatus.COMPLETED,
-                ExecutionStatus.RUNNING,
-            )
-    
-    def test_invalid_transition_pending_to_completed(self):
-        """Test PENDING cannot skip to COMPLETED."""
-        with pytest.raises(InvalidTransitionError):
-            WorkflowStateMachine.transition(
-                ExecutionStatus.PENDING,
-                ExecutionStatus.COMPLETED,
-            )
-    
-    def test_invalid_transition_pending_to_failed(self):
-        """Test PENDING cannot skip to FAILED."""
-        with pytest.raises(InvalidTransitionError):
-            WorkflowStateMachine.transition(
-                ExecutionStatus.PENDING,
-                ExecutionStatus.FAILED,
-            )
+    @pytest.mark.parametrize(
+        "from_state,to_state",
+        [
+            (ExecutionStatus.PENDING, ExecutionStatus.RUNNING),
+            (ExecutionStatus.RUNNING, ExecutionStatus.COMPLETED),
+            (ExecutionStatus.RUNNING, ExecutionStatus.FAILED),
+            (ExecutionStatus.FAILED, ExecutionStatus.RETRYING),
+            (ExecutionStatus.RETRYING, ExecutionStatus.RUNNING),
+            # Any non-terminal state can be cancelled
+            (ExecutionStatus.PENDING, ExecutionStatus.CANCELLED),
+            (ExecutionStatus.RUNNING, ExecutionStatus.CANCELLED),
+            (ExecutionStatus.FAILED, ExecutionStatus.CANCELLED),
+            (ExecutionStatus.RETRYING, ExecutionStatus.CANCELLED),
+        ],
+        ids=["pend-run", "run-done", "run-fail", "fail-retry", "retry-run", "pend-cancel", "run-cancel", "fail-cancel", "retry-cancel"],
+    )
+    def test_valid_transition(self, valid_transitions_snapshot, from_state, to_state):
+        """Test valid transitions return the new state."""
+        result = WorkflowStateMachine.transition(from_state, to_state)
+        assert result == to_state
+        assert to_state in valid_transitions_snapshot[from_state]
+    
+    @pytest.mark.parametrize(
+        "from_state,to_state",
+        [
+            # COMPLETED is terminal
+            (ExecutionStatus.COMPLETED, ExecutionStatus.RUNNING),
+            # PENDING cannot skip ahead
+            (ExecutionStatus.PENDING, ExecutionStatus.COMPLETED),
+            (ExecutionStatus.PENDING, ExecutionStatus.FAILED),
+        ],
+        ids=["done-run", "pend-done", "pend-fail"],
+    )
+    def test_invalid_transition(self, valid_transitions_snapshot, from_state, to_state):
+        """Test invalid transitions raise an error naming both states."""
+        with pytest.raises(InvalidTransitionError) as exc_info:
+            WorkflowStateMachine.transition(from_state, to_state)
+        
+        assert exc_info.value.from_state == from_state
+        assert exc_info.value.to_state == to_state
+        message = str(exc_info.value).lower()
+        assert from_state.name.lower() in message
+        assert to_state.name.lower() in message
+        assert to_state not in valid_transitions_snapshot[from_state]
     
     def test_can_transition(self):
         """Test can_transition method."""
@@ -98,76 +84,66 @@ class TestWorkflowStateMachine:
             ExecutionStatus.PENDING, ExecutionStatus.COMPLETED
         )
     
-    def test_is_terminal(self):
+    @pytest.mark.parametrize(
+        "status,expected",
+        [
+            (ExecutionStatus.PENDING, False),
+            (ExecutionStatus.RUNNING, False),
+            (ExecutionStatus.COMPLETED, True),
+            (ExecutionStatus.FAILED, True),
+            (ExecutionStatus.CANCELLED, True),
+            (ExecutionStatus.RETRYING, False),
+        ],
+        ids=["pending", "running", "completed", "failed", "cancelled", "retrying"],
+    )
+    def test_is_terminal(self, status, expected):
         """Test is_terminal method."""
-        assert WorkflowStateMachine.is_terminal(ExecutionStatus.COMPLETED)
-        assert WorkflowStateMachine.is_terminal(ExecutionStatus.FAILED)
-        assert WorkflowStateMachine.is_terminal(ExecutionStatus.CANCELLED)
-        assert not WorkflowStateMachine.is_terminal(ExecutionStatus.PENDING)
-        assert not WorkflowStateMachine.is_terminal(ExecutionStatus.RUNNING)
-        assert not WorkflowStateMachine.is_terminal(ExecutionStatus.RETRYING)
-    
-    def test_can_retry(self):
+        assert WorkflowStateMachine.is_terminal(status) is expected
+    
+    @pytest.mark.parametrize(
+        "status,expected",
+        [
+            (ExecutionStatus.FAILED, True),
+            (ExecutionStatus.COMPLETED, False),
+            (ExecutionStatus.RUNNING, False),
+        ],
+        ids=["failed", "completed", "running"],
+    )
+    def test_can_retry(self, status, expected):
         """Test can_retry method."""
-        assert WorkflowStateMachine.can_retry(ExecutionStatus.FAILED)
-        assert not WorkflowStateMachine.can_retry(ExecutionStatus.COMPLETED)
-        assert not WorkflowStateMachine.can_retry(ExecutionStatus.RUNNING)
+        assert WorkflowStateMachine.can_retry(status) is expected
     
-    def test_get_valid_transitions(self):
+    def test_get_valid_transitions(self, valid_transitions_snapshot):
         """Test get_valid_transitions method."""
-        pending_transitions = WorkflowStateMachine.get_valid_transitions(
-            ExecutionStatus.PENDING
-        )
+        pending_transitions = valid_transitions_snapshot[ExecutionStatus.PENDING]
         assert ExecutionStatus.RUNNING in pending_transitions
         assert ExecutionStatus.CANCELLED in pending_transitions
         assert ExecutionStatus.COMPLETED not in pending_transitions
     
-    def test_get_transition_path_direct(self):
-        """Test finding direct transition path."""
-        path = WorkflowStateMachine.get_transition_path(
-            ExecutionStatus.PENDING,
-            ExecutionStatus.RUNNING,
-        )
-        assert path == [ExecutionStatus.PENDING, ExecutionStatus.RUNNING]
-    
-    def test_get_transition_path_multi_step(self):
-        """Test finding multi-step transition path."""
-        path = WorkflowStateMachine.get_transition_path(
-            ExecutionStatus.PENDING,
-            ExecutionStatus.COMPLETED,
-        )
-        # Should find: PENDING → RUNNING → COMPLETED
-        assert path is not None
-        assert path[0] == ExecutionStatus.PENDING
-        assert path[-1] == ExecutionStatus.COMPLETED
-        assert len(path) == 3
-    
-    def test_get_transition_path_no_path(self):
-        """Test when no valid path exists."""
-        path = WorkflowStateMachine.get_transition_path(
-            ExecutionStatus.COMPLETED,
-            ExecutionStatus.RUNNING,
-        )
-        assert path is None
-    
-    def test_get_transition_path_same_state(self):
-        """Test path from state to itself."""
-        path = WorkflowStateMachine.get_transition_path(
-            ExecutionStatus.RUNNING,
-            ExecutionStatus.RUNNING,
-        )
-        assert path == [ExecutionStatus.RUNNING]
-    
-    def test_invalid_transition_error_message(self):
-        """Test error message contains state information."""
-        try:
-            WorkflowStateMachine.transition(
-                ExecutionStatus.COMPLETED,
-                ExecutionStatus.RUNNING,
-            )
-            pytest.fail("Should have raised InvalidTransitionError")
-        except InvalidTransitionError as e:
-            assert e.from_state == ExecutionStatus.COMPLETED
-            assert e.to_state == ExecutionStatus.RUNNING
-            assert "completed" in str(e).lower()
-            assert "running" in str(e).lower()
+    @pytest.mark.parametrize(
+        "start,end,expected_len,expected_first,expected_last",
+        [
+            (ExecutionStatus.PENDING, ExecutionStatus.RUNNING, 2,
+             ExecutionStatus.PENDING, ExecutionStatus.RUNNING),
+            # PENDING → RUNNING → COMPLETED
+            (ExecutionStatus.PENDING, ExecutionStatus.COMPLETED, 3,
+             ExecutionStatus.PENDING, ExecutionStatus.COMPLETED),
+            (ExecutionStatus.COMPLETED, ExecutionStatus.RUNNING, None, None, None),
+            (ExecutionStatus.RUNNING, ExecutionStatus.RUNNING, 1,
+             ExecutionStatus.RUNNING, ExecutionStatus.RUNNING),
+        ],
+        ids=["direct", "multi_step", "no_path", "same_state"],
+    )
+    def test_get_transition_path(
+        self, cached_paths, start, end, expected_len, expected_first, expected_last
+    ):
+        """Test BFS paths between states; None means no path exists."""
+        path = cached_paths(start, end)
+        
+        if expected_len is None:
+            assert path is None
+            return
+        
+        assert len(path) == expected_len
+        assert path[0] == expected_first
+        assert path[-1] == expected_last
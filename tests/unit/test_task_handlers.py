@@ -3,30 +3,35 @@ Unit tests for task handlers.
 """
 
 import pytest
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 
 from src.services.task_handlers import (
     TaskHandlerRegistry,
-    HttpRequestHandler,
-    DataTransformHandler,
     DelayHandler,
-    ConditionalHandler,
-    LogHandler,
-    create_default_registry,
+    StepDeferred,
 )
 
 
+def _resp(status=200, body=None):
+    """Minimal stand-in for a requests.Response."""
+    return SimpleNamespace(
+        status_code=status,
+        json=lambda: body or {},
+        text="" if body is None else str(body),
+    )
+
+
 class TestTaskHandlerRegistry:
     """Tests for TaskHandlerRegistry."""
     
-    def test_register_handler(self):
+    def test_register_handler(self, log_handler):
         """Test registering a handler."""
         registry = TaskHandlerRegistry()
-        handler = LogHandler()
         
-        registry.register(handler)
+        registry.register(log_handler)
         
-        assert registry.get_handler("log") == handler
+        assert registry.get_handler("log") == log_handler
     
     def test_get_unregistered_handler(self):
         """Test getting an unregistered handler returns None."""
@@ -34,11 +39,9 @@ class TestTaskHandlerRegistry:
         
         assert registry.get_handler("nonexistent") is None
     
-    def test_list_task_types(self):
+    def test_list_task_types(self, default_registry):
         """Test listing registered task types."""
-        registry = create_default_registry()
-        
-        types = registry.list_task_types()
+        types = default_registry.list_task_types()
         
         assert "http_request" in types
         assert "data_transform" in types
@@ -50,16 +53,13 @@ class TestTaskHandlerRegistry:
 class TestLogHandler:
     """Tests for LogHandler."""
     
-    def test_task_type(self):
+    def test_task_type(self, log_handler):
         """Test task type property."""
-        handler = LogHandler()
-        assert handler.task_type == "log"
+        assert log_handler.task_type == "log"
     
-    def test_execute_basic(self):
+    def test_execute_basic(self, log_handler):
         """Test basic log execution."""
-        handler = LogHandler()
-        
-        result = handler.execute(
+        result = log_handler.execute(
             step_config={"message": "Test message"},
             input_data={},
         )
@@ -67,22 +67,36 @@ class TestLogHandler:
         assert result["logged_message"] == "Test message"
         assert result["level"] == "info"
     
-    def test_execute_with_template(self):
+    def test_execute_with_template(self, log_handler):
         """Test log with template substitution."""
-        handler = LogHandler()
-        
-        result = handler.execute(
+        result = log_handler.execute(
             step_config={"message": "Hello, {name}!"},
             input_data={"name": "World"},
         )
         
         assert result["logged_message"] == "Hello, World!"
     
-    def test_execute_with_level(self):
-        """Test log with custom level."""
-        handler = LogHandler()
+    def test_execute_with_missing_template_key(self, log_handler):
+        """Test template with a missing key leaves the message unchanged."""
+        result = log_handler.execute(
+            step_config={"message": "Hello, {name}!"},
+            input_data={"other": "value"},
+        )
         
-        result = handler.execute(
+        assert result["logged_message"] == "Hello, {name}!"
+    
+    def test_execute_with_escaped_closing_brace(self, log_handler):
+        """Test an escaped closing brace is rendered even with no placeholder."""
+        result = log_handler.execute(
+            step_config={"message": "done }}"},
+            input_data={},
+        )
+        
+        assert result["logged_message"] == "done }"
+    
+    def test_execute_with_level(self, log_handler):
+        """Test log with custom level."""
+        result = log_handler.execute(
             step_config={"message": "Warning!", "level": "warning"},
             input_data={},
         )
@@ -93,206 +107,128 @@ class TestLogHandler:
 class TestDelayHandler:
     """Tests for DelayHandler."""
     
-    def test_task_type(self):
+    def test_task_type(self, delay_handler):
         """Test task type property."""
-        handler = DelayHandler()
-        assert handler.task_type == "delay"
+        assert delay_handler.task_type == "delay"
     
     @patch("time.sleep")
-    def test_execute(self, mock_sleep):
+    def test_execute(self, mock_sleep, delay_handler):
         """Test delay execution."""
-        handler = DelayHandler()
-        
-        result = handler.execute(
+        result = delay_handler.execute(
             step_config={"seconds": 5},
             input_data={},
         )
         
         mock_sleep.assert_called_once_with(5)
         assert result["delayed_seconds"] == 5
+    
+    @patch("time.sleep")
+    def test_execute_defers_long_delay(self, mock_sleep):
+        """Test delays over the inline threshold are deferred, not slept."""
+        handler = DelayHandler(max_inline_seconds=1)
+        
+        with pytest.raises(StepDeferred) as exc_info:
+            handler.execute(
+                step_config={"seconds": 5},
+                input_data={},
+            )
+        
+        mock_sleep.assert_not_called()
+        assert exc_info.value.seconds == 5
+        assert exc_info.value.output == {"delayed_seconds": 5}
 
 
 class TestConditionalHandler:
     """Tests for ConditionalHandler."""
     
-    def test_task_type(self):
+    def test_task_type(self, conditional_handler):
         """Test task type property."""
-        handler = ConditionalHandler()
-        assert handler.task_type == "conditional"
+        assert conditional_handler.task_type == "conditional"
     
-    def test_execute_eq_true(self):
-        """Test equality condition - true."""
-        handler = ConditionalHandler()
-        
-        result = handler.execute(
+    @pytest.mark.parametrize(
+        "operator,field,value,input_data,expected",
+        [
+            ("eq", "status", "active", {"status": "active"}, True),
+            ("eq", "status", "active", {"status": "inactive"}, False),
+            ("gt", "count", 5, {"count": 10}, True),
+            ("contains", "tags", "important", {"tags": ["important", "urgent"]}, True),
+            ("exists", "optional_field", None, {"optional_field": "value"}, True),
+        ],
+        ids=["eq_true", "eq_false", "gt", "contains", "exists"],
+    )
+    def test_execute(self, conditional_handler, operator, field, value, input_data, expected):
+        """Test each operator picks the matching branch."""
+        condition = {"field": field, "operator": operator}
+        if operator != "exists":
+            condition["value"] = value
+        
+        result = conditional_handler.execute(
             step_config={
-                "condition": {
-                    "field": "status",
-                    "operator": "eq",
-                    "value": "active",
-                },
+                "condition": condition,
                 "on_true": {"action": "proceed"},
                 "on_false": {"action": "skip"},
             },
-            input_data={"status": "active"},
+            input_data=input_data,
         )
         
-        assert result["condition_result"] is True
-        assert result["action"] == "proceed"
-    
-    def test_execute_eq_false(self):
-        """Test equality condition - false."""
-        handler = ConditionalHandler()
-        
-        result = handler.execute(
-            step_config={
-                "condition": {
-                    "field": "status",
-                    "operator": "eq",
-                    "value": "active",
-                },
-                "on_true": {"action": "proceed"},
-                "on_false": {"action": "skip"},
-            },
-            input_data={"status": "inactive"},
-        )
-        
-        assert result["condition_result"] is False
-        assert result["action"] == "skip"
-    
-    def test_execute_gt(self):
-        """Test greater than condition."""
-        handler = ConditionalHandler()
-        
-        result = handler.execute(
-            step_config={
-                "condition": {
-                    "field": "count",
-                    "operator": "gt",
-                    "value": 5,
-                },
-            },
-            input_data={"count": 10},
-        )
-        
-        assert result["condition_result"] is True
-    
-    def test_execute_contains(self):
-        """Test contains condition."""
-        handler = ConditionalHandler()
-        
-        result = handler.execute(
-            step_config={
-                "condition": {
-                    "field": "tags",
-                    "operator": "contains",
-                    "value": "important",
-                },
-            },
-            input_data={"tags": ["important", "urgent"]},
-        )
-        
-        assert result["condition_result"] is True
-    
-    def test_execute_exists(self):
-        """Test exists condition."""
-        handler = ConditionalHandler()
-        
-        result = handler.execute(
-            step_config={
-                "condition": {
-                    "field": "optional_field",
-                    "operator": "exists",
-                },
-            },
-            input_data={"optional_field": "value"},
-        )
-        
-        assert result["condition_result"] is True
+        assert result["condition_result"] is expected
+        assert result["action"] == ("proceed" if expected else "skip")
 
 
 class TestDataTransformHandler:
     """Tests for DataTransformHandler."""
     
-    def test_task_type(self):
+    def test_task_type(self, data_transform_handler):
         """Test task type property."""
-        handler = DataTransformHandler()
-        assert handler.task_type == "data_transform"
-    
-    def test_execute_rename(self):
-        """Test rename transformation."""
-        handler = DataTransformHandler()
-        
-        result = handler.execute(
-            step_config={
-                "transforms": [
-                    {"type": "rename", "from": "old_name", "to": "new_name"}
-                ]
-            },
-            input_data={"old_name": "value"},
-        )
-        
-        assert "old_name" not in result
-        assert result["new_name"] == "value"
-    
-    def test_execute_set(self):
-        """Test set transformation."""
-        handler = DataTransformHandler()
-        
-        result = handler.execute(
-            step_config={
-                "transforms": [
-                    {"type": "set", "key": "new_key", "value": "new_value"}
-                ]
-            },
-            input_data={},
-        )
-        
-        assert result["new_key"] == "new_value"
+        assert data_transform_handler.task_type == "data_transform"
     
-    def test_execute_delete(self):
-        """Test delete transformation."""
-        handler = DataTransformHandler()
-        
-        result = handler.execute(
-            step_config={
-                "transforms": [
-                    {"type": "delete", "keys": ["key1", "key2"]}
-                ]
-            },
-            input_data={"key1": "v1", "key2": "v2", "key3": "v3"},
+    @pytest.mark.parametrize(
+        "transforms,input_data,expected_subset,forbidden_keys",
+        [
+            (
+                [{"type": "rename", "from": "old_name", "to": "new_name"}],
+                {"old_name": "value"},
+                {"new_name": "value"},
+                ["old_name"],
+            ),
+            (
+                [{"type": "set", "key": "new_key", "value": "new_value"}],
+                {},
+                {"new_key": "new_value"},
+                [],
+            ),
+            (
+                [{"type": "delete", "keys": ["key1", "key2"]}],
+                {"key1": "v1", "key2": "v2", "key3": "v3"},
+                {"key3": "v3"},
+                ["key1", "key2"],
+            ),
+            (
+                [{"type": "extract", "key": "response.data.id", "as": "extracted_id"}],
+                {"response": {"data": {"id": "12345"}}},
+                {"extracted_id": "12345"},
+                [],
+            ),
+        ],
+        ids=["rename", "set", "delete", "extract"],
+    )
+    def test_execute_transform(
+        self, data_transform_handler, transforms, input_data, expected_subset, forbidden_keys
+    ):
+        """Test each transform type on its own."""
+        result = data_transform_handler.execute(
+            step_config={"transforms": transforms},
+            input_data=input_data,
         )
         
-        assert "key1" not in result
-        assert "key2" not in result
-        assert result["key3"] == "v3"
+        for key, value in expected_subset.items():
+            assert result[key] == value
+        for key in forbidden_keys:
+            assert key not in result
     
-    def test_execute_extract_nested(self):
-        """Test extract transformation with nested path."""
-        handler = DataTransformHandler()
-        
-        result = handler.execute(
-            step_config={
-                "transforms": [
-                    {"type": "extract", "key": "response.data.id", "as": "extracted_id"}
-                ]
-            },
-            input_data={
-                "response": {
-                    "data": {
-                        "id": "12345"
-                    }
-                }
-            },
-        )
-        
-        assert result["extracted_id"] == "12345"
-    
-    def test_execute_multiple_transforms(self):
+    def test_execute_multiple_transforms(self, data_transform_handler):
         """Test multiple transformations in sequence."""
-        handler = DataTransformHandler()
-        
-        result = handler.execute(
+        result = data_transform_handler.execute(
             step_config={
                 "transforms": [
                     {"type": "rename", "from": "input", "to": "processed"},
@@ -309,90 +245,89 @@ class TestDataTransformHandler:
         assert "input" not in result
 
 
+@pytest.mark.xdist_group("http_mock")
 class TestHttpRequestHandler:
     """Tests for HttpRequestHandler."""
     
-    def test_task_type(self):
+    @pytest.fixture(autouse=True)
+    def mock_request(self, monkeypatch):
+        """Replace requests.request so no test reaches the network."""
+        mock = MagicMock()
+        monkeypatch.setattr("requests.request", mock)
+        return mock
+    
+    def test_task_type(self, http_handler):
         """Test task type property."""
-        handler = HttpRequestHandler()
-        assert handler.task_type == "http_request"
+        assert http_handler.task_type == "http_request"
     
-    @patch("requests.request")
-    def test_execute_get_request(self, mock_request):
-        """Test GET request execution."""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"data": "test"}
-        mock_request.return_value = mock_response
-        
-        handler = HttpRequestHandler()
-        result = handler.execute(
-            step_config={
-                "url": "https://api.example.com/test",
-                "method": "GET",
-            },
-            input_data={},
-        )
+    @pytest.mark.parametrize(
+        "method,url,body,input_data,expected_url",
+        [
+            ("GET", "https://api.example.com/test", None, {}, "https://api.example.com/test"),
+            (
+                "POST",
+                "https://api.example.com/create",
+                {"name": "test"},
+                {},
+                "https://api.example.com/create",
+            ),
+            (
+                "GET",
+                "https://api.example.com/users/{user_id}",
+                None,
+                {"user_id": "456"},
+                "https://api.example.com/users/456",
+            ),
+        ],
+        ids=["get", "post", "url_template"],
+    )
+    def test_execute_request(
+        self, mock_request, http_handler, method, url, body, input_data, expected_url
+    ):
+        """Test the request is built from the step config and input."""
+        mock_request.return_value = _resp(200, {"data": "test"})
+        
+        step_config = {"url": url, "method": method}
+        if body is not None:
+            step_config["body"] = body
+        
+        result = http_handler.execute(step_config=step_config, input_data=input_data)
         
         mock_request.assert_called_once()
+        call_args = mock_request.call_args
+        assert call_args.kwargs["method"] == method
+        assert call_args.kwargs["url"] == expected_url
+        assert call_args.kwargs["json"] == body
         assert result["status_code"] == 200
         assert result["response"]["data"] == "test"
     
-    @patch("requests.request")
-    def test_execute_post_request(self, mock_request):
-        """Test POST request execution."""
-        mock_response = MagicMock()
-        mock_response.status_code = 201
-        mock_response.json.return_value = {"id": "123"}
-        mock_request.return_value = mock_response
-        
-        handler = HttpRequestHandler()
-        result = handler.execute(
-            step_config={
-                "url": "https://api.example.com/create",
-                "method": "POST",
-                "body": {"name": "test"},
-            },
-            input_data={},
-        )
-        
-        mock_request.assert_called_once()
-        call_args = mock_request.call_args
-        assert call_args.kwargs["method"] == "POST"
-        assert call_args.kwargs["json"] == {"name": "test"}
+    def test_prepare_reuses_step_config(self, mock_request, http_handler):
+        """Test a prepared step can be run repeatedly with new input."""
+        mock_request.return_value = _resp(200)
+        
+        run = http_handler.prepare({
+            "url": "https://api.example.com/users/{user_id}",
+            "method": "post",
+            "expected_status": [200],
+        })
+        
+        run({"user_id": "1"}, 10)
+        run({"user_id": "2"}, 10)
+        
+        urls = [c.kwargs["url"] for c in mock_request.call_args_list]
+        assert urls == [
+            "https://api.example.com/users/1",
+            "https://api.example.com/users/2",
+        ]
+        assert mock_request.call_args.kwargs["method"] == "POST"
+        assert mock_request.call_args.kwargs["timeout"] == 10
     
-    @patch("requests.request")
-    def test_execute_with_url_template(self, mock_request):
-        """Test URL template substitution."""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {}
-        mock_request.return_value = mock_response
-        
-        handler = HttpRequestHandler()
-        handler.execute(
-            step_config={
-                "url": "https://api.example.com/users/{user_id}",
-                "method": "GET",
-            },
-            input_data={"user_id": "456"},
-        )
-        
-        call_args = mock_request.call_args
-        assert call_args.kwargs["url"] == "https://api.example.com/users/456"
-    
-    @patch("requests.request")
-    def test_execute_unexpected_status(self, mock_request):
+    def test_execute_unexpected_status(self, mock_request, http_handler):
         """Test handling of unexpected status codes."""
-        mock_response = MagicMock()
-        mock_response.status_code = 500
-        mock_response.text = "Internal Server Error"
-        mock_request.return_value = mock_response
-        
-        handler = HttpRequestHandler()
+        mock_request.return_value = _resp(500, "Internal Server Error")
         
         with pytest.raises(Exception, match="HTTP request failed"):
-            handler.execute(
+            http_handler.execute(
                 step_config={
                     "url": "https://api.example.com/error",
                     "method": "GET",
@@ -0,0 +1,393 @@
+"""
+Unit tests for the background worker.
+"""
+
+import logging
+import threading
+import time
+from queue import Queue
+from types import SimpleNamespace
+
+import pytest
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from src.worker.queue import QueueMessage
+from src.worker.worker import Worker, _configure_logging
+
+
+EXECUTION_ID = UUID("b0000000-0000-4000-8000-000000000001")
+SLOW_EXECUTION_ID = UUID("b0000000-0000-4000-8000-000000000003")
+
+
+@pytest.fixture
+def db():
+    """A mock database that reports healthy."""
+    db = MagicMock()
+    db.health_check.return_value = True
+    return db
+
+
+@pytest.fixture
+def worker():
+    """A worker around a mock queue and database."""
+    return Worker(queue=MagicMock(), db=MagicMock())
+
+
+@pytest.fixture
+def live_worker(queue):
+    """
+    A single-handler worker on the fake Redis queue, with a mock orchestrator.
+    
+    SLOW_EXECUTION_ID blocks in execute() until `release` is set.
+    """
+    worker = Worker(queue=queue, db=MagicMock())
+    worker.concurrency = 1
+    worker._local_queue = Queue(maxsize=1)
+    worker._setup_signal_handlers = lambda: None
+    worker.release = threading.Event()
+    
+    def execute(execution_id, resume_state=None):
+        if execution_id == SLOW_EXECUTION_ID:
+            worker.release.wait(5)
+        return {"status": "completed"}
+    
+    worker.orchestrator = MagicMock()
+    worker.orchestrator.execute.side_effect = execute
+    return worker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Stand-in for the worker module's monotonic clock; set clock.now to move it."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        "src.worker.worker.time",
+        SimpleNamespace(monotonic=lambda: clock.now, time=time.time, sleep=time.sleep),
+    )
+    return clock
+
+
+def _run_in_background(worker):
+    """Start the worker on a thread; returns the thread."""
+    thread = threading.Thread(target=worker.start, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_for(condition, timeout=2.0):
+    """Poll until condition() is true or timeout passes; returns its last value."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def _message(attempt=1):
+    return QueueMessage.create(EXECUTION_ID).with_attempt(attempt)
+
+
+class TestFlushAcks:
+    """Tests for batched acknowledge and reject."""
+    
+    def test_failed_flush_keeps_messages_buffered(self, worker):
+        """Test a Redis error puts the batch back for the next flush instead of raising."""
+        acked, rejected = _message(), _message()
+        worker.queue.acknowledge_batch.side_effect = [ConnectionError("down"), True]
+        worker._settle(acked, succeeded=True)
+        worker._settle(rejected, succeeded=False)
+        
+        worker._flush_acks(force=True)
+        
+        assert worker._pending_acks == [acked]
+        assert worker._pending_rejects == [rejected]
+        
+        worker._flush_acks(force=True)
+        
+        worker.queue.acknowledge_batch.assert_called_with([acked])
+        worker.queue.reject_batch.assert_any_call([rejected])
+        assert worker._pending_acks == []
+        assert worker._pending_rejects == []
+    
+    def test_failed_flush_only_restores_what_was_not_sent(self, worker):
+        """Test groups that reached Redis before the failure aren't flushed twice."""
+        retry, exhausted = _message(), _message(attempt=worker.config.MAX_RETRIES)
+        worker.queue.reject_batch.side_effect = [True, ConnectionError("down")]
+        worker._settle(retry, succeeded=False)
+        worker._settle(exhausted, succeeded=False)
+        
+        worker._flush_acks(force=True)
+        
+        assert worker._pending_acks == []
+        assert worker._pending_rejects == [exhausted]
+    
+    def test_flush_settles_batch_in_redis(self, queue):
+        """Test one flush acks, retries and dead-letters a mixed batch."""
+        worker = Worker(queue=queue, db=MagicMock())
+        for attempt in (1, 1, worker.config.MAX_RETRIES):
+            queue.redis.lpush(queue.queue_name, _message(attempt).to_json())
+        acked, retried, exhausted = queue.dequeue_batch(3, timeout=0)
+        worker._settle(acked, succeeded=True)
+        worker._settle(retried, succeeded=False)
+        worker._settle(exhausted, succeeded=False)
+        
+        worker._flush_acks(force=True)
+        
+        assert queue.get_lengths() == {"queue_length": 1, "processing_length": 0, "dlq_length": 1}
+        [requeued] = queue.dequeue_batch(1, timeout=0)
+        assert (requeued.id, requeued.attempt) == (retried.id, 2)
+        [dead_lettered] = queue.redis.lrange(queue.dlq_name, 0, -1)
+        assert QueueMessage.from_json(dead_lettered).id == exhausted.id
+    
+    def test_busy_handler_ack_sent_by_deadline(self, live_worker, queue):
+        """Test an ack goes out within QUEUE_BATCH_MAX_DELAY_MS while the only handler is busy."""
+        queue.enqueue(EXECUTION_ID)
+        queue.enqueue(SLOW_EXECUTION_ID)
+        thread = _run_in_background(live_worker)
+        
+        try:
+            assert _wait_for(lambda: live_worker.orchestrator.execute.call_count == 2)
+            started = time.monotonic()
+            assert _wait_for(lambda: queue.get_processing_length() == 1)
+            assert time.monotonic() - started < 1.0
+            assert live_worker._pending_acks == []
+        finally:
+            live_worker.release.set()
+            live_worker.stop()
+            thread.join(5)
+        
+        assert queue.get_processing_length() == 0
+    
+    def test_idle_flush_error_keeps_handler_running(self, worker):
+        """Test an idle handler thread survives a failing flush."""
+        def fail_and_stop(messages):
+            worker._running = False
+            raise ConnectionError("down")
+        
+        worker.queue.acknowledge_batch.side_effect = fail_and_stop
+        worker._pending_acks.append(_message())
+        worker._running = True
+        
+        worker._handler_loop()
+        
+        assert len(worker._pending_acks) == 1
+
+
+class TestProcessOne:
+    """Tests for processing a single message."""
+    
+    def test_visibility_restarts_when_handler_takes_message(self, live_worker, queue):
+        """Test time spent waiting in the buffer doesn't count against the visibility timeout."""
+        queue.enqueue(EXECUTION_ID)
+        [message] = queue.dequeue_batch(1, timeout=0)
+        queue.redis.zadd(queue.processing_deadlines, {message.id: 0})  # Claimed long ago
+        deadlines = []
+        
+        def execute(execution_id, resume_state=None):
+            deadlines.append(queue.redis.zscore(queue.processing_deadlines, message.id))
+            return {"status": "completed"}
+        
+        live_worker.orchestrator.execute.side_effect = execute
+        live_worker._local_queue.put(message)
+        taken = time.time()
+        
+        live_worker._handler_loop()
+        
+        assert deadlines[0] >= taken + message.visibility_timeout
+    
+    def test_deferred_result_is_rescheduled(self, worker):
+        """Test a deferred execution is re-enqueued with its resume state after the delay."""
+        resume_state = {"steps": {"wait": {}}, "data": {"x": 1}}
+        worker.orchestrator = MagicMock()
+        worker.orchestrator.execute.return_value = {
+            "status": "deferred",
+            "delay_seconds": 60,
+            "resume_state": resume_state,
+        }
+        message = _message()
+        
+        assert worker._process_one(message) is True
+        
+        worker.queue.enqueue.assert_called_once_with(
+            EXECUTION_ID,
+            task_type=message.task_type,
+            payload={"resume_state": resume_state},
+            delay_seconds=60,
+        )
+
+
+class TestRecovery:
+    """Tests for periodic stale message recovery."""
+    
+    def test_runs_once_per_interval_and_refreshes_caches(self, queue, db, clock):
+        """Test recovery waits out RECOVERY_INTERVAL, then refreshes health and queue lengths."""
+        worker = Worker(queue=queue, db=db)
+        queue.recover_stale_messages = MagicMock(return_value=0)
+        worker._last_recovery = clock.now
+        queue.enqueue(EXECUTION_ID)
+        
+        clock.now += worker.RECOVERY_INTERVAL - 1
+        worker._maybe_recover()
+        
+        queue.recover_stale_messages.assert_not_called()
+        assert worker._health_cache is None
+        assert worker._queue_lengths is None
+        
+        clock.now += 1
+        worker._maybe_recover()
+        worker._maybe_recover()
+        
+        queue.recover_stale_messages.assert_called_once_with()
+        assert worker._health_cache == (clock.now, True, True)
+        assert worker._queue_lengths == {"queue_length": 1, "processing_length": 0, "dlq_length": 0}
+    
+    def test_recovery_error_still_refreshes_caches(self, queue, db, clock):
+        """Test a failed recovery is logged, not raised, and the caches still refresh."""
+        worker = Worker(queue=queue, db=db)
+        queue.recover_stale_messages = MagicMock(side_effect=ConnectionError("down"))
+        worker._last_recovery = clock.now - worker.RECOVERY_INTERVAL
+        
+        worker._maybe_recover()
+        
+        assert worker._health_cache == (clock.now, True, True)
+        assert worker._queue_lengths == {"queue_length": 0, "processing_length": 0, "dlq_length": 0}
+    
+    def test_recovery_error_keeps_prefetch_loop_running(self, live_worker, queue):
+        """Test the worker keeps claiming and processing messages while recovery fails."""
+        live_worker.RECOVERY_INTERVAL = 0
+        queue.recover_stale_messages = MagicMock(side_effect=ConnectionError("down"))
+        thread = _run_in_background(live_worker)
+        
+        try:
+            assert _wait_for(lambda: queue.recover_stale_messages.call_count >= 2)
+            queue.enqueue(EXECUTION_ID)
+            assert _wait_for(lambda: live_worker.orchestrator.execute.call_count == 1)
+        finally:
+            live_worker.stop()
+            thread.join(5)
+        
+        assert queue.get_processing_length() == 0
+
+
+
+class TestHealth:
+    """Tests for the cached health probe."""
+    
+    @pytest.fixture
+    def probed(self, worker, db, clock):
+        """The worker's db swapped for the healthy mock, with the queue healthy too."""
+        worker.db = db
+        worker.queue.health_check.return_value = True
+        return worker
+    
+    def test_probe_reused_within_ttl(self, probed, clock):
+        """Test a second check within HEALTH_CACHE_TTL makes no database or Redis calls."""
+        assert probed.is_healthy is True
+        clock.now += probed.HEALTH_CACHE_TTL - 0.1
+        
+        assert probed.is_healthy is True
+        
+        assert probed.db.health_check.call_count == 1
+        assert probed.queue.health_check.call_count == 1
+    
+    def test_probe_repeated_after_ttl(self, probed, clock):
+        """Test the first check after the TTL probes again and sees a new result."""
+        assert probed.is_healthy is True
+        probed.queue.health_check.return_value = False
+        clock.now += probed.HEALTH_CACHE_TTL
+        
+        assert probed.is_healthy is False
+        
+        assert probed.db.health_check.call_count == 2
+        assert probed.queue.health_check.call_count == 2
+    
+    def test_probe_error_reports_unhealthy(self, probed):
+        """Test a probe that raises reports unhealthy instead of propagating."""
+        probed.db.health_check.side_effect = ConnectionError("down")
+        
+        assert probed.is_healthy is False
+
+
+class TestStats:
+    """Tests for worker statistics."""
+    
+    def test_stats_keys(self, queue, db):
+        """Test get_stats reports counters, queue lengths and both current message keys."""
+        worker = Worker(queue=queue, db=db)
+        message = _message()
+        worker._in_flight[message.id] = message
+        worker._settle(_message(), succeeded=True)
+        
+        stats = worker.get_stats()
+        
+        assert stats == {
+            "running": False,
+            "queue_length": 0,
+            "processing_length": 0,
+            "dlq_length": 0,
+            "processed": 1,
+            "failed": 0,
+            "in_flight": 1,
+            "prefetched": 0,
+            "current_message": message.id,
+            "current_messages": [message.id],
+        }
+    
+    def test_no_redis_calls_once_lengths_cached(self, queue, db, monkeypatch):
+        """Test get_stats serves queue lengths from the cache once it's warm."""
+        worker = Worker(queue=queue, db=db)
+        worker._refresh_queue_lengths()
+        redis_client = MagicMock()
+        monkeypatch.setattr(queue, "_redis", redis_client)
+        
+        stats = worker.get_stats()
+        
+        assert stats["queue_length"] == 0
+        assert stats["current_message"] is None
+        assert redis_client.mock_calls == []
+
+
+class TestShutdown:
+    """Tests for stopping a running worker."""
+    
+    def test_stop_drains_buffer_and_flushes(self, live_worker, queue):
+        """Test stop() lets handlers finish prefetched messages, then acks them all and closes the queue."""
+        queue.enqueue(SLOW_EXECUTION_ID)
+        queue.enqueue(EXECUTION_ID)
+        thread = _run_in_background(live_worker)
+        assert _wait_for(lambda: live_worker._local_queue.full())
+        
+        live_worker.stop()
+        live_worker.release.set()
+        thread.join(5)
+        
+        assert not thread.is_alive()
+        assert live_worker.orchestrator.execute.call_count == 2
+        assert live_worker._pending_acks == []
+        assert queue._redis is None
+        assert queue.get_lengths() == {"queue_length": 0, "processing_length": 0, "dlq_length": 0}
+
+
+
+class TestConfigureLogging:
+    """Tests for the worker's root logging setup."""
+    
+    def test_configured_once(self, monkeypatch):
+        """Test a second call adds no handler, so log lines aren't duplicated."""
+        root = logging.getLogger()
+        monkeypatch.setattr(root, "handlers", [])
+        monkeypatch.setattr(root, "level", root.level)
+        monkeypatch.setattr(logging, "logProcesses", True)
+        monkeypatch.setattr(logging, "logMultiprocessing", True)
+        monkeypatch.setattr(
+            "src.worker.worker.get_config",
+            lambda: SimpleNamespace(LOG_LEVEL="debug", LOG_FORMAT="%(process)d %(message)s"),
+        )
+        
+        _configure_logging()
+        _configure_logging()
+        
+        [handler] = root.handlers
+        assert handler.formatter._fmt == "%(process)d %(message)s"
+        assert root.level == logging.DEBUG
+        assert (logging.logProcesses, logging.logMultiprocessing) == (True, False)
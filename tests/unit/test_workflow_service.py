@@ -2,9 +2,14 @@
 Unit tests for workflow service.
 """
 
+import copy
+import dataclasses
+import re
+
 import pytest
-from unittest.mock import MagicMock, patch
-from uuid import uuid4
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
 
 from src.domain import Workflow, WorkflowStep, WorkflowStatus
 from src.services.workflow_service import (
@@ -14,220 +19,335 @@ from src.services.workflow_service import (
 )
 
 
-class TestWorkflowService:
-    """Tests for WorkflowService."""
-    
-    @pytest.fixture
-    def mock_repo(self):
-        """Create a mock repository."""
-        return MagicMock()
-    
-    @pytest.fixture
-    def service(self, mock_repo):
-        """Create service with mock repository."""
-        return WorkflowService(mock_repo)
-    
-    def test_create_workflow(self, service, mock_repo):
-        """Test workflow creation."""
-        mock_repo.get_workflow_by_name.return_value = None
-        mock_repo.create_workflow.side_effect = lambda w: w
-        
-        workflow = service.create_workflow(
-            name="test-workflow",
-            description="Test description",
-            metadata={"owner": "test"},
-        )
-        
-        assert workflow.name == "test-workflow"
-        assert workflow.description == "Test description"
-        assert workflow.status == WorkflowStatus.DRAFT
-        mock_repo.create_workflow.assert_called_once()
-    
-    def test_create_workflow_empty_name(self, service):
-        """Test that empty name raises error."""
-        with pytest.raises(WorkflowValidationError, match="name is required"):
-            service.create_workflow(name="", description="Test")
-    
-    def test_create_workflow_whitespace_name(self, service):
-        """Test that whitespace-only name raises error."""
-        with pytest.raises(WorkflowValidationError, match="name is required"):
-            service.create_workflow(name="   ", description="Test")
-    
-    def test_create_workflow_duplicate_name(self, service, mock_repo):
-        """Test that duplicate name raises error."""
-        existing_workflow = Workflow.create(name="existing")
-        mock_repo.get_workflow_by_name.return_value = existing_workflow
-        
-        with pytest.raises(WorkflowValidationError, match="already exists"):
-            service.create_workflow(name="existing", description="Test")
-    
-    def test_add_step(self, service, mock_repo):
-        """Test adding a step to a workflow."""
-        workflow = Workflow.create(name="test")
-        mock_repo.get_workflow_by_id.return_value = workflow
-        mock_repo.add_step.side_effect = lambda s: s
-        
-        step = service.add_step(
-            workflow_id=workflow.id,
-            name="step1",
-            task_type="log",
-            step_order=0,
-            config={"message": "test"},
-        )
-        
-        assert step.name == "step1"
-        assert step.task_type == "log"
-        mock_repo.add_step.assert_called_once()
-    
-    def test_add_step_to_non_draft_workflow(self, service, mock_repo):
-        """Test that steps cannot be added to non-draft workflows."""
-        workflow = Workflow.create(name="test")
-        workflow.status = WorkflowStatus.ACTIVE
-        mock_repo.get_workflow_by_id.return_value = workflow
-        
-        with pytest.raises(WorkflowValidationError, match="Cannot add steps"):
-            service.add_step(
-                workflow_id=workflow.id,
-                name="step1",
-                task_type="log",
-                step_order=0,
-            )
+# Status members bound once, so tests skip the enum attribute lookup
+_DRAFT = WorkflowStatus.DRAFT
+_ACTIVE = WorkflowStatus.ACTIVE
+_DEPRECATED = WorkflowStatus.DEPRECATED
+_ARCHIVED = WorkflowStatus.ARCHIVED
+
+# Expected WorkflowValidationError messages, compiled once for pytest.raises(match=...)
+_NAME_REQUIRED = re.compile("name is required")
+_ALREADY_EXISTS = re.compile("already exists")
+_CANNOT_ADD = re.compile("Cannot add steps")
+_STEP_NAME_REQUIRED = re.compile("Step name is required")
+_NO_STEPS = re.compile("without steps")
+_DRAFT_ONLY = re.compile("DRAFT status")
+_NOT_SEQUENTIAL = re.compile("sequential")
+
+# An id no test seeds into the repository
+_MISSING_ID = uuid4()
+
+_BARE_CREATED_AT = datetime(2024, 1, 1)
+
+# Session templates are built during whichever test asks first, so their ids
+# come from a range of their own rather than that test's uuid4 counter
+_TEMPLATE_ID_BASE = UUID("c0000000-0000-4000-8000-000000000000").int
+
+
+def _bare_workflow(**overrides) -> Workflow:
+    """
+    Build a Workflow without going through Workflow.create().
     
-    def test_add_step_empty_name(self, service, mock_repo):
-        """Test that step with empty name raises error."""
-        workflow = Workflow.create(name="test")
-        mock_repo.get_workflow_by_id.return_value = workflow
-        
-        with pytest.raises(WorkflowValidationError, match="Step name is required"):
-            service.add_step(
-                workflow_id=workflow.id,
-                name="",
-                task_type="log",
-                step_order=0,
-            )
+    For tests that only store, return or compare a workflow; pass id=
+    when several must coexist in the repository.
+    """
+    workflow = object.__new__(Workflow)
+    workflow.__dict__.update(
+        id=UUID("b0000000-0000-4000-8000-000000000000"),
+        name="test",
+        description="",
+        status=_DRAFT,
+        version=1,
+        steps=[],
+        metadata={},
+        created_at=_BARE_CREATED_AT,
+        updated_at=_BARE_CREATED_AT,
+    )
+    workflow.__dict__.update(overrides)
+    return workflow
+
+
+# Workflows for the list tests, built once at import; tests only read them
+_LIST_WORKFLOWS_SAMPLE = tuple(
+    _bare_workflow(id=UUID(f"b0000000-0000-4000-8000-00000000000{i + 1}"), name=f"test-{i}")
+    for i in range(3)
+)
+
+
+class FakeWorkflowRepository:
+    """
+    In-memory stand-in for WorkflowRepository.
     
-    def test_add_step_duplicate_order(self, service, mock_repo):
-        """Test that duplicate step order raises error."""
-        workflow = Workflow.create(name="test")
-        existing_step = WorkflowStep.create(
-            workflow_id=workflow.id,
-            name="existing",
-            task_type="log",
-            step_order=0,
-        )
-        workflow.steps = [existing_step]
-        mock_repo.get_workflow_by_id.return_value = workflow
-        
-        with pytest.raises(WorkflowValidationError, match="already exists"):
-            service.add_step(
-                workflow_id=workflow.id,
-                name="new",
+    Stores seeded workflows and records each write so tests can assert on
+    them directly.
+    """
+    
+    def __init__(self):
+        self.workflows: Dict[UUID, Workflow] = {}
+        self.created: List[Workflow] = []
+        self.added_steps: List[WorkflowStep] = []
+        self.status_updates: List[Tuple[UUID, WorkflowStatus]] = []
+        self.list_calls: List[Dict] = []
+    
+    def reset(self) -> None:
+        """Drop all stored workflows and recorded calls."""
+        self.__init__()
+    
+    def seed(self, *workflows: Workflow) -> None:
+        """Make workflows visible to the lookup methods."""
+        for workflow in workflows:
+            self.workflows[workflow.id] = workflow
+    
+    def create_workflow(self, workflow: Workflow) -> Workflow:
+        self.created.append(workflow)
+        self.workflows[workflow.id] = workflow
+        return workflow
+    
+    def add_step(self, step: WorkflowStep) -> WorkflowStep:
+        self.added_steps.append(step)
+        return step
+    
+    def get_workflow_by_id(self, workflow_id: UUID) -> Optional[Workflow]:
+        return self.workflows.get(workflow_id)
+    
+    def get_workflow_by_name(self, name: str) -> Optional[Workflow]:
+        for workflow in self.workflows.values():
+            if workflow.name == name:
+                return workflow
+        return None
+    
+    def update_workflow_status(self, workflow_id: UUID, status: WorkflowStatus) -> bool:
+        self.status_updates.append((workflow_id, status))
+        return workflow_id in self.workflows
+    
+    def list_workflows(
+        self,
+        status: Optional[WorkflowStatus] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[Workflow]:
+        self.list_calls.append({"status": status, "limit": limit, "offset": offset})
+        workflows = [
+            w for w in self.workflows.values() if status is None or w.status == status
+        ]
+        return workflows[offset:offset + limit]
+
+
+@pytest.fixture(scope="session")
+def _workflow_template():
+    """Pristine DRAFT workflow, built once and copied per test."""
+    return dataclasses.replace(Workflow.create(name="test"), id=UUID(int=_TEMPLATE_ID_BASE))
+
+
+@pytest.fixture
+def workflow(_workflow_template):
+    """A fresh copy of the DRAFT workflow template."""
+    return copy.deepcopy(_workflow_template)
+
+
+@pytest.fixture(scope="session")
+def _step_templates(_workflow_template):
+    """Log steps of the template workflow, built once per step_order."""
+    templates = {}
+    
+    def get(step_order):
+        if step_order not in templates:
+            step = WorkflowStep.create(
+                workflow_id=_workflow_template.id,
+                name=f"step-{step_order}",
                 task_type="log",
-                step_order=0,
+                step_order=step_order,
             )
+            templates[step_order] = dataclasses.replace(
+                step, id=UUID(int=_TEMPLATE_ID_BASE + 1 + step_order)
+            )
+        return templates[step_order]
+    return get
+
+
+@pytest.fixture
+def make_step(_step_templates):
+    """Return a fresh copy of the template step at a given step_order."""
+    return lambda step_order: copy.deepcopy(_step_templates(step_order))
+
+
+@pytest.fixture(scope="module")
+def repo():
+    """
+    Create a fake repository.
     
-    def test_get_workflow(self, service, mock_repo):
-        """Test getting a workflow."""
-        workflow = Workflow.create(name="test")
-        mock_repo.get_workflow_by_id.return_value = workflow
-        
-        result = service.get_workflow(workflow.id)
-        
-        assert result == workflow
-    
-    def test_get_workflow_not_found(self, service, mock_repo):
-        """Test getting non-existent workflow."""
-        mock_repo.get_workflow_by_id.return_value = None
-        
-        with pytest.raises(WorkflowNotFoundError):
-            service.get_workflow(uuid4())
-    
-    def test_activate_workflow(self, service, mock_repo):
-        """Test workflow activation."""
-        workflow = Workflow.create(name="test")
-        step = WorkflowStep.create(
-            workflow_id=workflow.id,
-            name="step1",
-            task_type="log",
-            step_order=0,
-        )
-        workflow.steps = [step]
-        mock_repo.get_workflow_by_id.return_value = workflow
-        mock_repo.update_workflow_status.return_value = True
-        
-        result = service.activate_workflow(workflow.id)
-        
-        assert result.status == WorkflowStatus.ACTIVE
-        mock_repo.update_workflow_status.assert_called_once()
-    
-    def test_activate_workflow_without_steps(self, service, mock_repo):
-        """Test that workflow without steps cannot be activated."""
-        workflow = Workflow.create(name="test")
-        workflow.steps = []
-        mock_repo.get_workflow_by_id.return_value = workflow
-        
-        with pytest.raises(WorkflowValidationError, match="without steps"):
-            service.activate_workflow(workflow.id)
-    
-    def test_activate_non_draft_workflow(self, service, mock_repo):
-        """Test that non-draft workflow cannot be activated."""
-        workflow = Workflow.create(name="test")
-        workflow.status = WorkflowStatus.ARCHIVED
-        mock_repo.get_workflow_by_id.return_value = workflow
-        
-        with pytest.raises(WorkflowValidationError, match="DRAFT status"):
-            service.activate_workflow(workflow.id)
-    
-    def test_activate_workflow_non_sequential_steps(self, service, mock_repo):
-        """Test that workflow with non-sequential steps cannot be activated."""
-        workflow = Workflow.create(name="test")
-        step1 = WorkflowStep.create(
+    Shared across the module; reset_repo empties it before each test.
+    """
+    return FakeWorkflowRepository()
+
+
+@pytest.fixture(scope="module")
+def service(repo):
+    """Create service with the fake repository."""
+    return WorkflowService(repo)
+
+
+@pytest.fixture(autouse=True)
+def reset_repo(repo):
+    """Clear workflows and calls left by the previous test."""
+    repo.reset()
+
+
+def test_create_workflow(service, repo):
+    """Test workflow creation."""
+    workflow = service.create_workflow(
+        name="test-workflow",
+        description="Test description",
+        metadata={"owner": "test"},
+    )
+    
+    assert workflow.name == "test-workflow"
+    assert workflow.description == "Test description"
+    assert workflow.status == _DRAFT
+    assert repo.created == [workflow]
+
+
+@pytest.mark.parametrize(
+    "name,exists,msg",
+    [
+        ("", False, _NAME_REQUIRED),
+        ("   ", False, _NAME_REQUIRED),
+        ("existing", True, _ALREADY_EXISTS),
+    ],
+    ids=["empty", "whitespace", "duplicate"],
+)
+def test_create_workflow_invalid_name(workflow, service, repo, name, exists, msg):
+    """Test that empty, blank and duplicate names are rejected."""
+    if exists:
+        workflow.name = name
+        repo.seed(workflow)
+    
+    with pytest.raises(WorkflowValidationError, match=msg):
+        service.create_workflow(name=name, description="Test")
+    assert repo.created == []
+
+
+def test_add_step(workflow, service, repo):
+    """Test adding a step to a workflow."""
+    repo.seed(workflow)
+    
+    step = service.add_step(
+        workflow_id=workflow.id,
+        name="step1",
+        task_type="log",
+        step_order=0,
+        config={"message": "test"},
+    )
+    
+    assert step.name == "step1"
+    assert step.task_type == "log"
+    assert repo.added_steps == [step]
+
+
+@pytest.mark.parametrize(
+    "status,existing_orders,name,msg",
+    [
+        (_ACTIVE, [], "step1", _CANNOT_ADD),
+        (_DRAFT, [], "", _STEP_NAME_REQUIRED),
+        (_DRAFT, [0], "new", _ALREADY_EXISTS),
+    ],
+    ids=["non_draft", "empty_name", "dup_order"],
+)
+def test_add_step_invalid(
+    workflow, make_step, service, repo, status, existing_orders, name, msg
+):
+    """Test that add_step rejects bad workflows and step definitions."""
+    workflow.status = status
+    workflow.steps = [make_step(order) for order in existing_orders]
+    repo.seed(workflow)
+    
+    with pytest.raises(WorkflowValidationError, match=msg):
+        service.add_step(
             workflow_id=workflow.id,
-            name="step1",
+            name=name,
             task_type="log",
             step_order=0,
         )
-        step2 = WorkflowStep.create(
-            workflow_id=workflow.id,
-            name="step2",
-            task_type="log",
-            step_order=5,  # Non-sequential
-        )
-        workflow.steps = [step1, step2]
-        mock_repo.get_workflow_by_id.return_value = workflow
-        
-        with pytest.raises(WorkflowValidationError, match="sequential"):
-            service.activate_workflow(workflow.id)
-    
-    def test_deprecate_workflow(self, service, mock_repo):
-        """Test workflow deprecation."""
-        workflow = Workflow.create(name="test")
-        workflow.status = WorkflowStatus.ACTIVE
-        mock_repo.get_workflow_by_id.return_value = workflow
-        mock_repo.update_workflow_status.return_value = True
-        
-        result = service.deprecate_workflow(workflow.id)
-        
-        assert result.status == WorkflowStatus.DEPRECATED
-    
-    def test_list_workflows(self, service, mock_repo):
-        """Test listing workflows."""
-        workflows = [Workflow.create(name=f"test-{i}") for i in range(3)]
-        mock_repo.list_workflows.return_value = workflows
-        
-        result = service.list_workflows(limit=10, offset=0)
-        
-        assert len(result) == 3
-        mock_repo.list_workflows.assert_called_once_with(
-            status=None, limit=10, offset=0
-        )
+    assert repo.added_steps == []
+
+
+def test_get_workflow(workflow, service, repo):
+    """Test getting a workflow."""
+    repo.seed(workflow)
     
-    def test_list_workflows_with_status_filter(self, service, mock_repo):
-        """Test listing workflows with status filter."""
-        mock_repo.list_workflows.return_value = []
-        
-        service.list_workflows(status=WorkflowStatus.ACTIVE)
-        
-        mock_repo.list_workflows.assert_called_once_with(
-            status=WorkflowStatus.ACTIVE, limit=100, offset=0
-        )
+    result = service.get_workflow(workflow.id)
+    
+    assert result == workflow
+
+
+def test_get_workflow_not_found(service):
+    """Test getting non-existent workflow."""
+    with pytest.raises(WorkflowNotFoundError):
+        service.get_workflow(_MISSING_ID)
+
+
+def test_activate_workflow(workflow, make_step, service, repo):
+    """Test workflow activation."""
+    step = make_step(0)
+    workflow.steps = [step]
+    repo.seed(workflow)
+    
+    result = service.activate_workflow(workflow.id)
+    
+    assert result.status == _ACTIVE
+    assert repo.status_updates == [(workflow.id, _ACTIVE)]
+
+
+@pytest.mark.parametrize(
+    "status,step_orders,msg",
+    [
+        (_DRAFT, [], _NO_STEPS),
+        (_ARCHIVED, [], _DRAFT_ONLY),
+        (_DRAFT, [0, 5], _NOT_SEQUENTIAL),
+    ],
+    ids=["no_steps", "non_draft", "gap"],
+)
+def test_activate_workflow_invalid(
+    workflow, make_step, service, repo, status, step_orders, msg
+):
+    """Test that activation rejects non-drafts and missing or non-sequential steps."""
+    workflow.status = status
+    workflow.steps = [make_step(order) for order in step_orders]
+    repo.seed(workflow)
+    
+    with pytest.raises(WorkflowValidationError, match=msg):
+        service.activate_workflow(workflow.id)
+    assert repo.status_updates == []
+
+
+def test_deprecate_workflow(workflow, service, repo):
+    """Test workflow deprecation."""
+    workflow.status = _ACTIVE
+    repo.seed(workflow)
+    
+    result = service.deprecate_workflow(workflow.id)
+    
+    assert result.status == _DEPRECATED
+
+
+def test_list_workflows(service, repo):
+    """Test listing workflows."""
+    repo.seed(*_LIST_WORKFLOWS_SAMPLE)
+    
+    result = service.list_workflows(limit=10, offset=0)
+    
+    assert result == list(_LIST_WORKFLOWS_SAMPLE)
+    assert repo.list_calls == [{"status": None, "limit": 10, "offset": 0}]
+
+
+def test_list_workflows_with_status_filter(service, repo):
+    """Test listing workflows with status filter."""
+    repo.seed(*_LIST_WORKFLOWS_SAMPLE)
+    
+    result = service.list_workflows(status=_ACTIVE)
+    
+    # The sample workflows are all DRAFT
+    assert result == []
+    assert repo.list_calls == [
+        {"status": _ACTIVE, "limit": 100, "offset": 0}
+    ]